@@ -0,0 +1,116 @@
+"""
+响应缓存
+将轮询频繁的读接口响应体缓存在Redis中（短TTL），写操作通过递增版本号使缓存失效
+"""
+
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 各类数据的缓存时间（秒）
+RULES_CACHE_TTL = 5
+ALERTS_CACHE_TTL = 2
+MONITOR_CACHE_TTL = 1
+
+# Redis不可用后跳过缓存的时长（秒），期间请求直接查询数据库，不再等待连接超时
+CACHE_RETRY_INTERVAL = 30
+
+_KEY_PREFIX = f"{settings.REDIS_PREFIX}cache:"
+
+# 与AppJSONResponse的序列化选项一致，缓存命中时可直接返回响应体
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+_redis: Optional[aioredis.Redis] = None
+_disabled_until = 0.0
+
+
+def init_cache(client: Optional[aioredis.Redis]):
+    """设置缓存使用的Redis客户端（应用启动时注入共用连接池的客户端），None表示停用缓存"""
+    global _redis, _disabled_until
+
+    _redis = client
+    _disabled_until = 0.0
+
+
+def _get_client() -> Optional[aioredis.Redis]:
+    """获取缓存使用的Redis客户端，未初始化或Redis近期不可用时返回None"""
+    if _redis is None or time.monotonic() < _disabled_until:
+        return None
+    return _redis
+
+
+def _mark_unavailable(e: Exception):
+    """记录Redis不可用，在CACHE_RETRY_INTERVAL内跳过缓存"""
+    global _disabled_until
+
+    _disabled_until = time.monotonic() + CACHE_RETRY_INTERVAL
+    logger.warning(f"Redis缓存不可用，{CACHE_RETRY_INTERVAL}秒内直接查询数据库: {e}")
+
+
+def _version_key(namespace: str) -> str:
+    return f"{_KEY_PREFIX}ver:{namespace}"
+
+
+def cache_key(path: str, query_string: str) -> str:
+    """根据请求路径和查询字符串生成缓存键"""
+    digest = hashlib.blake2b(query_string.encode(), digest_size=8).hexdigest()
+    return f"{path}:{digest}"
+
+
+async def cached(namespace: str, key: str, ttl: int,
+                 coro_factory: Callable[[], Awaitable[Any]]) -> bytes:
+    """
+    读取缓存的JSON响应体，未命中时调用coro_factory生成并写入缓存
+
+    缓存键包含namespace当前的版本号，invalidate(namespace)后旧缓存不再被读取。
+    success为False的响应不写入缓存；Redis出错时直接返回coro_factory的结果
+    """
+    client = _get_client()
+    if client is None:
+        return orjson.dumps(await coro_factory(), option=_JSON_OPTIONS)
+
+    try:
+        version = await client.get(_version_key(namespace))
+        full_key = f"{_KEY_PREFIX}{namespace}:{int(version or 0)}:{key}"
+        body = await client.get(full_key)
+    except RedisError as e:
+        _mark_unavailable(e)
+        return orjson.dumps(await coro_factory(), option=_JSON_OPTIONS)
+
+    if body is not None:
+        return body
+
+    payload = await coro_factory()
+    body = orjson.dumps(payload, option=_JSON_OPTIONS)
+
+    if not (isinstance(payload, dict) and payload.get("success") is False):
+        try:
+            await client.set(full_key, body, ex=ttl)
+        except RedisError as e:
+            _mark_unavailable(e)
+
+    return body
+
+
+async def invalidate(*namespaces: str):
+    """递增各namespace的版本号，使其下所有缓存失效"""
+    client = _get_client()
+    if client is None:
+        return
+
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.incr(_version_key(namespace))
+            await pipe.execute()
+    except RedisError as e:
+        _mark_unavailable(e)
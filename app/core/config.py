@@ -19,6 +19,8 @@ class Settings(BaseSettings):
     # 服务器设置
     HOST: str = "0.0.0.0"
     PORT: int = 6002
+    # 多工作进程时只有持有Redis监控锁的一个进程运行告警监控，告警推流经Redis频道发给所有进程
+    UVICORN_WORKERS: int = Field(1, description="uvicorn工作进程数（DEBUG模式下使用热重载，固定为单进程）")
     
     # Redis设置 - 生产环境默认本地
     REDIS_HOST: str = "localhost"  # 生产环境默认本地
@@ -7,13 +7,35 @@ import sqlite3
 import os
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 from contextlib import contextmanager
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 连接级PRAGMA（每个请求使用新连接，页缓存、内存映射等随连接关闭即失效的参数不在此设置；
+# 忙等待时间由sqlite3.connect的timeout参数设置）
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys=ON;",        # 启用外键约束
+    "PRAGMA synchronous=NORMAL;",     # WAL模式下减少fsync，提升写入性能
+)
+
+# trigram分词的最短可匹配关键词长度
+FTS_MIN_KEYWORD_LENGTH = 3
+
+# 全文索引表 -> (源表, 索引字段)
+FTS_TABLES = {
+    "alert_fts": ("alert", ("rule_name", "channel_id", "point_id")),
+    "alert_event_fts": ("alert_event", ("rule_name", "channel_id", "point_id")),
+    "alert_rule_fts": ("alert_rule", ("rule_name", "description", "channel_id", "point_id")),
+}
+
+
+def fts_phrase(keyword: str) -> str:
+    """将关键词转为FTS5短语整体匹配，转义双引号避免FTS5语法错误"""
+    return '"' + keyword.replace('"', '""') + '"'
+
 
 class DatabaseManager:
     """数据库管理器"""
@@ -22,6 +44,7 @@ class DatabaseManager:
         self.db_path = settings.DATABASE_PATH
         self.timeout = settings.DATABASE_TIMEOUT
         self._connection: Optional[sqlite3.Connection] = None
+        self.fts_enabled = False  # FTS5全文索引是否可用
     
     def ensure_database_exists(self) -> bool:
         """确保数据库文件存在，如果不存在则创建"""
@@ -60,6 +83,24 @@ class DatabaseManager:
             logger.error(f"数据库初始化失败: {e}")
             return False
     
+    def load_fts_state(self) -> bool:
+        """读取已有数据库的全文索引是否可用（数据库已由其他工作进程初始化时使用）"""
+        try:
+            with self.get_connection() as conn:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            
+            if "alert_rule" not in tables:
+                logger.error(f"数据库尚未初始化: {self.db_path}")
+                return False
+            
+            self.fts_enabled = all(fts_table in tables for fts_table in FTS_TABLES)
+            logger.info(f"使用现有数据库: {self.db_path}，全文索引{'可用' if self.fts_enabled else '不可用'}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"读取数据库状态失败: {e}")
+            return False
+    
     def enable_wal_mode(self, conn: sqlite3.Connection):
         """启用WAL (Write-Ahead Logging) 模式"""
         try:
@@ -75,15 +116,17 @@ class DatabaseManager:
                 logger.info("WAL模式已经启用")
                 
             # 设置其他WAL相关参数
-            conn.execute("PRAGMA synchronous=NORMAL;")  # 更好的性能
-            conn.execute("PRAGMA cache_size=10000;")    # 增大缓存
-            conn.execute("PRAGMA temp_store=memory;")   # 临时表存储在内存中
-            conn.execute("PRAGMA foreign_keys=ON;")     # 启用外键约束
+            self.apply_connection_pragmas(conn)
             
         except Exception as e:
             logger.error(f"启用WAL模式失败: {e}")
             raise
     
+    def apply_connection_pragmas(self, conn: sqlite3.Connection):
+        """设置连接级PRAGMA（journal_mode会持久化到数据库文件，其余参数只对当前连接生效）"""
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+    
     def create_tables(self, conn: sqlite3.Connection):
         """创建表结构"""
         try:
@@ -163,6 +206,7 @@ class DatabaseManager:
             indexes = [
                 # alert_rule表索引
                 "CREATE INDEX IF NOT EXISTS idx_alert_rule_service_channel_type_point ON alert_rule(service_type, channel_id, data_type, point_id);",
+                "CREATE INDEX IF NOT EXISTS idx_alert_rule_channel_service ON alert_rule(channel_id, service_type);",
                 "CREATE INDEX IF NOT EXISTS idx_alert_rule_service_type ON alert_rule(service_type);",
                 "CREATE INDEX IF NOT EXISTS idx_alert_rule_enabled ON alert_rule(enabled);",
                 "CREATE INDEX IF NOT EXISTS idx_alert_rule_warning_level ON alert_rule(warning_level);",
@@ -200,20 +244,86 @@ class DatabaseManager:
             """
             conn.execute(trigger_sql)
             
+            # 创建关键词搜索用的全文索引
+            self.create_fts_tables(conn)
+            
             logger.info("数据库表结构创建完成")
             
         except Exception as e:
             logger.error(f"创建表结构失败: {e}")
             raise
     
+    def create_fts_tables(self, conn: sqlite3.Connection):
+        """创建alert/alert_event/alert_rule的FTS5全文索引（trigram分词，支持子串匹配）"""
+        try:
+            for fts_table, (source_table, fields) in FTS_TABLES.items():
+                columns = ", ".join(fields)
+                new_values = ", ".join(f"new.{field}" for field in fields)
+                old_values = ", ".join(f"old.{field}" for field in fields)
+                
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+                ).fetchone()
+                
+                conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                    {columns},
+                    content='{source_table}', content_rowid='id', tokenize='trigram'
+                );
+                """)
+                
+                # 通过触发器保持索引与源表同步
+                conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source_table}
+                BEGIN
+                    INSERT INTO {fts_table}(rowid, {columns})
+                    VALUES (new.id, {new_values});
+                END;
+                """)
+                conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source_table}
+                BEGIN
+                    INSERT INTO {fts_table}({fts_table}, rowid, {columns})
+                    VALUES ('delete', old.id, {old_values});
+                END;
+                """)
+                conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {columns} ON {source_table}
+                BEGIN
+                    INSERT INTO {fts_table}({fts_table}, rowid, {columns})
+                    VALUES ('delete', old.id, {old_values});
+                    INSERT INTO {fts_table}(rowid, {columns})
+                    VALUES (new.id, {new_values});
+                END;
+                """)
+                
+                # 新建索引时为已有数据建立索引
+                if not exists:
+                    conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild');")
+                    logger.info(f"全文索引已创建: {fts_table}")
+            
+            conn.commit()
+            self.fts_enabled = True
+            
+        except sqlite3.OperationalError as e:
+            # SQLite未编译FTS5或不支持trigram分词时退回LIKE查询
+            conn.rollback()
+            self.fts_enabled = False
+            logger.warning(f"全文索引不可用，关键词搜索将使用LIKE: {e}")
+    
     @contextmanager
-    def get_connection(self):
-        """获取数据库连接的上下文管理器"""
+    def get_connection(self, check_same_thread: bool = True):
+        """
+        获取数据库连接的上下文管理器
+        
+        check_same_thread=False用于在生成器中持有的连接：流式响应会在线程池的不同线程中
+        依次推进生成器（不会并发访问），需要允许跨线程使用同一连接
+        """
         conn = None
         try:
-            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=check_same_thread)
             conn.row_factory = sqlite3.Row  # 使结果可以按列名访问
-            conn.execute("PRAGMA foreign_keys=ON;")  # 确保每个连接都启用外键约束
+            self.apply_connection_pragmas(conn)  # 连接级参数每个连接都需设置
             yield conn
         except Exception as e:
             if conn:
@@ -230,6 +340,12 @@ class DatabaseManager:
             cursor = conn.execute(sql, params)
             return cursor.fetchall()
     
+    def execute_iter(self, sql: str, params: tuple = ()) -> Iterator[sqlite3.Row]:
+        """执行查询并逐行返回结果（不整体加载到内存）"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(sql, params)
+            yield from cursor
+    
     def execute_insert(self, sql: str, params: tuple = ()) -> int:
         """执行插入操作并返回插入的行ID"""
         with self.get_connection() as conn:
@@ -262,6 +378,11 @@ def init_database() -> bool:
     return db_manager.ensure_database_exists()
 
 
+def load_database() -> bool:
+    """加载已由其他工作进程初始化的数据库（不执行建表）"""
+    return db_manager.load_fts_state()
+
+
 def get_db_manager() -> DatabaseManager:
     """获取数据库管理器实例"""
     return db_manager
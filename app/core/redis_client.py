@@ -0,0 +1,32 @@
+"""
+Redis连接
+应用启动时创建一个连接池，监控引擎和响应缓存共用同一个客户端
+"""
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+# 连接池最大连接数
+REDIS_MAX_CONNECTIONS = 50
+
+
+def create_redis_client() -> aioredis.Redis:
+    """创建带连接池的异步Redis客户端（连接在首次使用时建立）"""
+    pool = aioredis.ConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+        health_check_interval=30
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+async def close_redis_client(client: aioredis.Redis):
+    """关闭Redis客户端及其连接池"""
+    await client.aclose()
+    await client.connection_pool.disconnect()
@@ -3,8 +3,8 @@
 导出所有数据模型
 """
 
-from .alert_rule import AlertRule, WarningLevel, ComparisonOperator, DataType, ServiceType
+from .alert_rule import AlertRule, AlertRuleIn, WarningLevel, ComparisonOperator, DataType, ServiceType
 from .alert import Alert, AlertEvent, AlertStatus, EventType
 
-__all__ = ["AlertRule", "WarningLevel", "ComparisonOperator", "DataType", "ServiceType", 
+__all__ = ["AlertRule", "AlertRuleIn", "WarningLevel", "ComparisonOperator", "DataType", "ServiceType", 
            "Alert", "AlertEvent", "AlertStatus", "EventType"]
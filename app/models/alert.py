@@ -3,12 +3,15 @@
 定义alert表和alert_event表的数据结构
 """
 
-import json
+import orjson
+import time
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
 
+from app.utils.time_parser import FROMISO_ACCEPTS_SPACE
+
 
 class AlertStatus(Enum):
     """告警状态枚举"""
@@ -45,7 +48,7 @@ class Alert:
         return {
             "id": self.id,
             "rule_id": self.rule_id,
-            "rule_snapshot": json.loads(self.rule_snapshot) if self.rule_snapshot else {},
+            "rule_snapshot": orjson.loads(self.rule_snapshot) if self.rule_snapshot else {},
             "service_type": self.service_type,
             "channel_id": self.channel_id,
             "data_type": self.data_type,
@@ -92,8 +95,8 @@ class Alert:
         if iso_string is None:
             return None
         try:
-            # 支持多种时间格式
-            if 'T' in iso_string:
+            # 支持多种时间格式（Python 3.11+ 的fromisoformat可直接解析空格分隔）
+            if FROMISO_ACCEPTS_SPACE or 'T' in iso_string:
                 dt = datetime.fromisoformat(iso_string)
             else:
                 dt = datetime.fromisoformat(iso_string.replace(' ', 'T'))
@@ -104,7 +107,7 @@ class Alert:
     def duration_seconds(self) -> Optional[int]:
         """计算告警持续时间（秒）"""
         if self.triggered_at:
-            return int((datetime.now().timestamp() - self.triggered_at))
+            return int(time.time() - self.triggered_at)
         return None
 
 
@@ -134,7 +137,7 @@ class AlertEvent:
         return {
             "id": self.id,
             "rule_id": self.rule_id,
-            "rule_snapshot": json.loads(self.rule_snapshot) if self.rule_snapshot else {},
+            "rule_snapshot": orjson.loads(self.rule_snapshot) if self.rule_snapshot else {},
             "service_type": self.service_type,
             "channel_id": self.channel_id,
             "data_type": self.data_type,
@@ -187,8 +190,8 @@ class AlertEvent:
         if iso_string is None:
             return None
         try:
-            # 支持多种时间格式
-            if 'T' in iso_string:
+            # 支持多种时间格式（Python 3.11+ 的fromisoformat可直接解析空格分隔）
+            if FROMISO_ACCEPTS_SPACE or 'T' in iso_string:
                 dt = datetime.fromisoformat(iso_string)
             else:
                 dt = datetime.fromisoformat(iso_string.replace(' ', 'T'))
@@ -199,7 +202,7 @@ class AlertEvent:
     @classmethod
     def from_alert(cls, alert: "Alert", event_type: str, recovery_value: Optional[float] = None) -> "AlertEvent":
         """从Alert对象创建AlertEvent"""
-        now = int(datetime.now().timestamp())
+        now = int(time.time())
         
         # 计算持续时间
         duration = None
@@ -5,10 +5,14 @@
 
 import sqlite3
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
 
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.utils.time_parser import FROMISO_ACCEPTS_SPACE
+
 
 class WarningLevel(Enum):
     """告警级别枚举"""
@@ -45,6 +49,22 @@ class DataType(Enum):
     ADJUSTMENT = "A" # 遥调
 
 
+class AlertRuleIn(BaseModel):
+    """创建/更新告警规则的请求数据（由pydantic-core完成必填、类型和取值校验）"""
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
+    service_type: Literal["comsrv", "rulesrv", "modsrv", "alarmsrv", "hissrv", "netsrv"] = "comsrv"
+    channel_id: int = Field(gt=0)
+    data_type: str = Field(min_length=1)  # data_type支持自定义，不限制固定值
+    point_id: int = Field(gt=0)
+    rule_name: str = Field(min_length=1, max_length=100)
+    warning_level: int = Field(ge=1, le=3)
+    operator: Literal[">", "<", ">=", "<=", "==", "!="]
+    value: float
+    enabled: bool = True
+    description: Optional[str] = Field("", max_length=500)
+
+
 @dataclass
 class AlertRule:
     """告警规则数据类"""
@@ -64,21 +84,9 @@ class AlertRule:
 
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
-        return {
-            "id": self.id,
-            "service_type": self.service_type,
-            "channel_id": self.channel_id,
-            "data_type": self.data_type,
-            "point_id": self.point_id,
-            "rule_name": self.rule_name,
-            "warning_level": self.warning_level,
-            "operator": self.operator,
-            "value": self.value,
-            "enabled": self.enabled,
-            "description": self.description,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-        }
+        # 数据类字段按声明顺序保存在实例__dict__中（不要给实例添加字段以外的属性），
+        # 直接复制比逐个读取属性构建字典快数倍，列表接口每行都会调用
+        return self.__dict__.copy()
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "AlertRule":
@@ -112,8 +120,8 @@ class AlertRule:
         if iso_string is None:
             return None
         try:
-            # 支持多种时间格式
-            if 'T' in iso_string:
+            # 支持多种时间格式（Python 3.11+ 的fromisoformat可直接解析空格分隔）
+            if FROMISO_ACCEPTS_SPACE or 'T' in iso_string:
                 dt = datetime.fromisoformat(iso_string)
             else:
                 dt = datetime.fromisoformat(iso_string.replace(' ', 'T'))
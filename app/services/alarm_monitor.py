@@ -5,20 +5,35 @@
 
 import asyncio
 import logging
-import redis
-import json
+import os
+import time
 import requests
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 from concurrent.futures import ThreadPoolExecutor
 
+import orjson
+import redis.asyncio as aioredis
+
+from app.core.cache import invalidate
 from app.core.config import settings
 from app.services.alert_rule_service import alert_rule_service
 from app.services.alert_service import alert_service
+from app.models.alert import Alert
 from app.models.alert_rule import AlertRule
 
 logger = logging.getLogger(__name__)
 
+# 每个告警推流订阅者最多缓存的未发送事件数，超出后丢弃新事件
+EVENT_QUEUE_SIZE = 100
+
+# 多工作进程部署时只有持有该锁的进程运行监控循环，锁过期后由其他进程接管（秒）
+_LEADER_LOCK_KEY = f"{settings.REDIS_PREFIX}monitor:leader"
+LEADER_LOCK_TTL = 30
+
+# 多工作进程部署时告警推流事件经该频道发给所有进程的订阅者
+_EVENT_CHANNEL = f"{settings.REDIS_PREFIX}monitor:events"
+
 
 class AlarmMonitor:
     """告警监控引擎"""
@@ -31,68 +46,168 @@ class AlarmMonitor:
         self.executor = ThreadPoolExecutor(max_workers=4)
         self.last_check_time = None
         self.last_alarm_count = 0  # 上次广播的告警数量
+        self.event_queues: Set[asyncio.Queue] = set()  # 告警推流（SSE）订阅者
+        self.ready = asyncio.Event()  # Redis连接成功、监控任务已启动（或已进入主进程竞选）后置位
+        self.election_task = None  # 监控主进程竞选任务（多工作进程部署）
+        self.relay_task = None  # 告警推流频道订阅任务（多工作进程部署）
+        self.leader_token = f"{os.getpid()}:{time.time()}".encode()
         
-    def start(self):
-        """启动监控"""
-        if self.is_running:
+    async def start_async(self, redis_client: aioredis.Redis):
+        """
+        启动监控（使用应用共用连接池的Redis客户端），完成后置位ready
+        
+        多工作进程部署时各进程竞选监控主进程，只有主进程运行监控循环，
+        告警推流事件经Redis频道发给所有进程的订阅者
+        """
+        if self.ready.is_set():
             logger.warning("告警监控已在运行")
             return
             
         try:
-            # 初始化Redis连接
-            self.redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB,
-                password=settings.REDIS_PASSWORD,
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5,
-                health_check_interval=30
-            )
+            self.redis_client = redis_client
             
             # 测试连接
-            self.redis_client.ping()
+            await self.redis_client.ping()
             logger.info(f"Redis连接成功: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
             
-            self.is_running = True
-            # 启动异步监控任务
-            self.monitor_task = asyncio.create_task(self._monitor_loop())
-            # 启动告警数量广播任务
-            self.alarm_count_task = asyncio.create_task(self._alarm_count_broadcast_loop())
+            if settings.UVICORN_WORKERS > 1 and not settings.DEBUG:
+                self.election_task = asyncio.create_task(self._leader_election_loop())
+                self.relay_task = asyncio.create_task(self._event_relay_loop())
+            else:
+                self._start_loops()
+            self.ready.set()
             logger.info("告警监控引擎启动成功")
             
         except Exception as e:
             logger.error(f"告警监控启动失败: {e}")
             self.redis_client = None
     
+    def _start_loops(self):
+        """启动监控循环和告警数量广播循环"""
+        self.is_running = True
+        # 启动异步监控任务
+        self.monitor_task = asyncio.create_task(self._monitor_loop())
+        # 启动告警数量广播任务
+        self.alarm_count_task = asyncio.create_task(self._alarm_count_broadcast_loop())
+    
+    async def _stop_loops(self):
+        """停止监控循环和告警数量广播循环"""
+        self.is_running = False
+        await self._cancel_task(self.monitor_task)
+        await self._cancel_task(self.alarm_count_task)
+        self.monitor_task = None
+        self.alarm_count_task = None
+    
+    @staticmethod
+    async def _cancel_task(task: Optional[asyncio.Task]):
+        """取消后台任务并等待其结束"""
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
     async def stop(self):
         """停止监控"""
-        if not self.is_running:
+        if not self.ready.is_set():
             return
             
-        self.is_running = False
+        self.ready.clear()
         
-        if self.monitor_task:
-            self.monitor_task.cancel()
-            try:
-                await self.monitor_task
-            except asyncio.CancelledError:
-                pass
+        # 多工作进程部署时，持有监控锁的进程停止后释放锁
+        release_lock = self.election_task is not None and self.is_running
+        await self._cancel_task(self.election_task)
+        await self._cancel_task(self.relay_task)
+        self.election_task = None
+        self.relay_task = None
         
-        if self.alarm_count_task:
-            self.alarm_count_task.cancel()
-            try:
-                await self.alarm_count_task
-            except asyncio.CancelledError:
-                pass
+        await self._stop_loops()
+        if release_lock:
+            await self._release_leader_lock()
         
-        if self.redis_client:
-            self.redis_client.close()
+        # Redis连接池由应用统一关闭
+        self.redis_client = None
             
         self.executor.shutdown(wait=True)
         logger.info("告警监控引擎已停止")
     
+    async def _leader_election_loop(self):
+        """
+        竞选监控主进程（多工作进程部署）
+        
+        主进程每LEADER_LOCK_TTL/3秒续期一次监控锁；主进程退出或失联导致锁过期后，
+        其他进程在下一轮竞选中获得锁并启动监控循环
+        """
+        while True:
+            try:
+                if self.is_running:
+                    if await self.redis_client.get(_LEADER_LOCK_KEY) == self.leader_token:
+                        await self.redis_client.expire(_LEADER_LOCK_KEY, LEADER_LOCK_TTL)
+                    else:
+                        logger.warning("监控锁已被其他进程持有，停止本进程的监控循环")
+                        await self._stop_loops()
+                elif await self.redis_client.set(_LEADER_LOCK_KEY, self.leader_token, nx=True, ex=LEADER_LOCK_TTL):
+                    logger.info(f"当前进程(PID {os.getpid()})成为监控主进程，启动监控循环")
+                    self._start_loops()
+            except Exception as e:
+                logger.error(f"监控主进程竞选异常: {e}")
+            
+            await asyncio.sleep(LEADER_LOCK_TTL / 3)
+    
+    async def _release_leader_lock(self):
+        """释放当前进程持有的监控锁，其他进程无需等待锁过期即可接管"""
+        try:
+            if await self.redis_client.get(_LEADER_LOCK_KEY) == self.leader_token:
+                await self.redis_client.delete(_LEADER_LOCK_KEY)
+        except Exception as e:
+            logger.warning(f"释放监控锁失败: {e}")
+    
+    async def _event_relay_loop(self):
+        """订阅告警推流频道，把各进程发布的事件放入本进程的订阅者队列（断开后自动重连）"""
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(_EVENT_CHANNEL)
+                    while True:
+                        # 带超时读取：空闲时按超时返回None，不会触发连接的socket_timeout
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None:
+                            self._deliver_event(message["data"])
+            except Exception as e:
+                logger.error(f"告警推流频道订阅异常，5秒后重连: {e}")
+                await asyncio.sleep(5)
+    
+    def subscribe(self) -> asyncio.Queue:
+        """注册告警推流订阅者，返回接收SSE消息的队列"""
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.event_queues.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        """注销告警推流订阅者"""
+        self.event_queues.discard(queue)
+    
+    async def _publish_event(self, event: Dict[str, Any]):
+        """将广播消息序列化为SSE消息发给订阅者（多工作进程部署时经Redis频道发给所有进程）"""
+        if self.relay_task is not None:
+            try:
+                await self.redis_client.publish(_EVENT_CHANNEL, b"data: " + orjson.dumps(event) + b"\n\n")
+            except Exception as e:
+                logger.error(f"发布告警推流事件失败: {event['id']}, 错误: {e}")
+            return
+        
+        if self.event_queues:
+            self._deliver_event(b"data: " + orjson.dumps(event) + b"\n\n")
+    
+    def _deliver_event(self, message: bytes):
+        """将SSE消息放入本进程所有订阅者队列"""
+        for queue in self.event_queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("告警推流订阅者处理过慢，丢弃事件")
+    
     async def _monitor_loop(self):
         """主监控循环"""
         logger.info("开始告警监控循环")
@@ -108,8 +223,9 @@ class AlarmMonitor:
                 else:
                     logger.debug(f"监控 {len(enabled_rules)} 条告警规则")
                     
-                    # 并发处理规则检查
-                    await self._process_rules_concurrent(enabled_rules)
+                    # 并发处理规则检查，告警有变化时使告警列表的缓存和ETag失效
+                    if await self._process_rules_concurrent(enabled_rules):
+                        await invalidate("alerts")
                 
                 # 记录检查时间
                 self.last_check_time = start_time
@@ -126,8 +242,8 @@ class AlarmMonitor:
                 logger.error(f"监控循环异常: {e}")
                 await asyncio.sleep(5)  # 异常时短暂等待
     
-    async def _process_rules_concurrent(self, rules: List[AlertRule]):
-        """并发处理规则检查"""
+    async def _process_rules_concurrent(self, rules: List[AlertRule]) -> bool:
+        """并发处理规则检查，返回是否有告警被创建、更新或解除"""
         try:
             # 将规则分组以减少Redis连接数
             tasks = []
@@ -136,19 +252,21 @@ class AlarmMonitor:
                 tasks.append(task)
             
             # 等待所有任务完成
-            await asyncio.gather(*tasks, return_exceptions=True)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            return any(result is True for result in results)
             
         except Exception as e:
             logger.error(f"并发处理规则异常: {e}")
+            return False
     
-    async def _check_single_rule(self, rule: AlertRule):
-        """检查单个规则"""
+    async def _check_single_rule(self, rule: AlertRule) -> bool:
+        """检查单个规则，返回是否有告警被创建、更新或解除"""
         try:
             # 从Redis获取数据
             current_value = await self._get_redis_value(rule)
             if current_value is None:
                 logger.debug(f"规则 {rule.rule_name} 无法获取数据: {rule.redis_key()}")
-                return
+                return False
             
             # 评估规则
             is_triggered = rule.evaluate(current_value)
@@ -161,6 +279,7 @@ class AlarmMonitor:
                     # 已有告警，更新当前值
                     alert_service.update_alert_value(existing_alert.id, current_value)
                     logger.debug(f"更新告警值: {rule.rule_name}, 当前值: {current_value}")
+                    return existing_alert.current_value != current_value
                 else:
                     # 新触发告警
                     alert_id = alert_service.create_alert(rule, current_value)
@@ -171,6 +290,7 @@ class AlarmMonitor:
                         # 立即发送告警数量广播
                         await self._send_alarm_count_broadcast()
                         self.last_alarm_count = alert_service.get_active_alert_count()
+                        return True
             else:
                 if existing_alert:
                     # 告警恢复
@@ -181,9 +301,13 @@ class AlarmMonitor:
                         # 立即发送告警数量广播
                         await self._send_alarm_count_broadcast()
                         self.last_alarm_count = alert_service.get_active_alert_count()
+                        return True
+            
+            return False
                 
         except Exception as e:
             logger.error(f"检查规则失败 {rule.rule_name}: {e}")
+            return False
     
     async def _get_redis_value(self, rule: AlertRule) -> Optional[float]:
         """从Redis获取数据值"""
@@ -191,14 +315,7 @@ class AlarmMonitor:
             redis_key = rule.redis_key()
             point_field = str(rule.point_id)
             
-            # 使用线程池执行Redis操作
-            loop = asyncio.get_event_loop()
-            value_str = await loop.run_in_executor(
-                self.executor,
-                self._redis_hget,
-                redis_key,
-                point_field
-            )
+            value_str = await self._redis_hget(redis_key, point_field)
             
             if value_str is not None:
                 try:
@@ -214,11 +331,11 @@ class AlarmMonitor:
             logger.error(f"从Redis获取数据失败: {e}")
             return None
     
-    def _redis_hget(self, key: str, field: str) -> Optional[str]:
-        """Redis HGET操作（同步）"""
+    async def _redis_hget(self, key: str, field: str) -> Optional[bytes]:
+        """Redis HGET操作"""
         try:
             if self.redis_client:
-                return self.redis_client.hget(key, field)
+                return await self.redis_client.hget(key, field)
             return None
         except Exception as e:
             logger.error(f"Redis操作失败: {e}")
@@ -282,18 +399,19 @@ class AlarmMonitor:
             }
     
     async def on_rule_updated(self, rule_id: int):
-        """规则更新时的回调处理"""
+        """规则更新时的回调处理（数据库操作在线程池中执行）"""
         try:
-            rule = alert_rule_service.get_rule_by_id(rule_id)
+            rule = await alert_rule_service.get_rule_by_id_async(rule_id)
             if not rule:
                 return
             
-            existing_alert = alert_service.get_alert_by_rule_id(rule_id)
+            existing_alert = await asyncio.to_thread(alert_service.get_alert_by_rule_id, rule_id)
             
             if not rule.enabled and existing_alert:
                 # 规则被禁用，解除现有告警并发送恢复广播
-                resolved_alerts = alert_service.resolve_alerts_by_rule_id(rule_id)
+                resolved_alerts = await asyncio.to_thread(alert_service.resolve_alerts_by_rule_id, rule_id)
                 logger.info(f"规则被禁用，解除相关告警: {rule.rule_name}")
+                await invalidate("alerts")
                 
                 # 为每个解除的告警发送恢复广播
                 for alert in resolved_alerts:
@@ -306,17 +424,50 @@ class AlarmMonitor:
         except Exception as e:
             logger.error(f"处理规则更新失败: {e}")
     
+    async def on_alerts_resolved(self, alerts: List[Alert], deleted_rule_ids: Set[int]):
+        """批量操作规则解除告警后的回调处理：发送恢复广播和告警数量广播"""
+        try:
+            for alert in alerts:
+                if alert.rule_id in deleted_rule_ids:
+                    rule, reason = self._rule_from_alert(alert), "规则被删除"
+                else:
+                    rule = await alert_rule_service.get_rule_by_id_async(alert.rule_id) or self._rule_from_alert(alert)
+                    reason = "规则被禁用"
+                await self._send_alarm_recovery_broadcast(alert.id, rule, None, reason=reason)
+            
+            if alerts:
+                await self._send_alarm_count_broadcast()
+                self.last_alarm_count = await asyncio.to_thread(alert_service.get_active_alert_count)
+            
+        except Exception as e:
+            logger.error(f"处理批量解除告警失败: {e}")
+    
+    @staticmethod
+    def _rule_from_alert(alert: Alert) -> AlertRule:
+        """由告警记录中的规则信息构造规则（规则已删除时用于恢复广播）"""
+        return AlertRule(
+            id=alert.rule_id,
+            service_type=alert.service_type,
+            channel_id=alert.channel_id,
+            data_type=alert.data_type,
+            point_id=alert.point_id,
+            rule_name=alert.rule_name,
+            warning_level=alert.warning_level,
+            operator=alert.operator,
+            value=alert.threshold_value
+        )
+    
     async def on_rule_deleted(self, rule_id: int):
-        """规则删除时的回调处理"""
+        """规则删除时的回调处理（数据库操作在线程池中执行）"""
         try:
             # 先获取规则信息（删除前）
-            rule = alert_rule_service.get_rule_by_id(rule_id)
+            rule = await alert_rule_service.get_rule_by_id_async(rule_id)
             if not rule:
                 logger.warning(f"规则ID {rule_id} 不存在")
                 return
                 
             # 解除该规则的所有告警
-            resolved_alerts = alert_service.resolve_alerts_by_rule_id(rule_id)
+            resolved_alerts = await asyncio.to_thread(alert_service.resolve_alerts_by_rule_id, rule_id)
             logger.info(f"规则删除，解除了 {len(resolved_alerts)} 条相关告警")
             
             # 为每个解除的告警发送恢复广播
@@ -328,7 +479,7 @@ class AlarmMonitor:
             # 如果有告警被解除，发送告警数量广播
             if resolved_alerts:
                 await self._send_alarm_count_broadcast()
-                self.last_alarm_count = alert_service.get_active_alert_count()
+                self.last_alarm_count = await asyncio.to_thread(alert_service.get_active_alert_count)
             
         except Exception as e:
             logger.error(f"处理规则删除失败: {e}")
@@ -340,7 +491,7 @@ class AlarmMonitor:
             broadcast_data = {
                 "type": "alarm",
                 "id": f"alarm_{alert_id:03d}",
-                "timestamp": int(datetime.now().timestamp()),
+                "timestamp": int(time.time()),
                 "data": {
                     "alarm_id": str(alert_id),
                     "service_type": rule.service_type,
@@ -356,6 +507,9 @@ class AlarmMonitor:
                 }
             }
             
+            # 推送给告警推流订阅者
+            await self._publish_event(broadcast_data)
+            
             # 多端点广播 - 同时向6005和6006端口发送
             broadcast_urls = [
                 "http://localhost:6005/api/v1/broadcast",
@@ -415,7 +569,7 @@ class AlarmMonitor:
             broadcast_data = {
                 "type": "alarm",
                 "id": f"alarm_{alert_id:03d}_recovery",
-                "timestamp": int(datetime.now().timestamp()),
+                "timestamp": int(time.time()),
                 "data": {
                     "alarm_id": str(alert_id),
                     "service_type": rule.service_type,
@@ -431,6 +585,9 @@ class AlarmMonitor:
                 }
             }
             
+            # 推送给告警推流订阅者
+            await self._publish_event(broadcast_data)
+            
             # 多端点广播 - 同时向6005和6006端口发送
             broadcast_urls = [
                 "http://localhost:6005/api/v1/broadcast",
@@ -475,19 +632,21 @@ class AlarmMonitor:
         except Exception as e:
             logger.error(f"发送告警恢复广播异常: 规则={rule.rule_name}, 告警ID={alert_id}, 异常={e}")
 
-    def get_monitor_status(self) -> Dict[str, Any]:
+    async def get_monitor_status(self) -> Dict[str, Any]:
         """获取监控状态"""
         try:
             redis_status = "disconnected"
             if self.redis_client:
                 try:
-                    self.redis_client.ping()
+                    await self.redis_client.ping()
                     redis_status = "connected"
                 except:
                     redis_status = "error"
             
             return {
                 "running": self.is_running,
+                # 多工作进程部署时只有主进程(leader)运行监控循环，其余进程为standby
+                "role": "leader" if self.is_running else ("standby" if self.election_task else "stopped"),
                 "redis_status": redis_status,
                 "last_check_time": self.last_check_time.isoformat() if self.last_check_time else None,
                 "check_interval": settings.DATA_FETCH_INTERVAL,
@@ -540,23 +699,27 @@ class AlarmMonitor:
         """发送告警数量广播消息到6005端口"""
         try:
             # 获取按等级分类的告警数量
-            level_counts = alert_service.get_active_alert_count_by_level()
+            level_counts = await asyncio.to_thread(alert_service.get_active_alert_count_by_level)
             
             # 构建广播消息
+            now = int(time.time())
             broadcast_data = {
                 "type": "alarm_num",
-                "id": f"alarm_num_{int(datetime.now().timestamp())}",
-                "timestamp": int(datetime.now().timestamp()),
+                "id": f"alarm_num_{now}",
+                "timestamp": now,
                 "data": {
                     "current_alarms": level_counts["current_alarms"],
                     "1": level_counts["1"],
                     "2": level_counts["2"],
                     "3": level_counts["3"],
-                    "update_time": int(datetime.now().timestamp()),
+                    "update_time": now,
                     "server_id": "alarmsrv"
                 }
             }
             
+            # 推送给告警推流订阅者
+            await self._publish_event(broadcast_data)
+            
             # 多端点广播 - 同时向6005和6006端口发送
             broadcast_urls = [
                 "http://localhost:6005/api/v1/broadcast",
@@ -3,21 +3,69 @@
 提供alert_rule表的CRUD操作
 """
 
+import asyncio
+import base64
+import binascii
 import logging
+import threading
+import time
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 
+from cachetools import TTLCache
+
+from app.models.alert import Alert
 from app.models.alert_rule import AlertRule
-from app.core.database import get_db_manager
+from app.core.config import settings
+from app.core.database import FTS_MIN_KEYWORD_LENGTH, fts_phrase, get_db_manager
+from app.services.alert_service import alert_service
 
 logger = logging.getLogger(__name__)
 
+# 流式查询每次从游标读取的行数
+RULE_ITER_CHUNK_SIZE = 256
+
+# 按ID读取规则的缓存容量与有效期（秒）
+RULE_CACHE_MAXSIZE = 1024
+RULE_CACHE_TTL = 5
+
+# 更新规则全部可编辑字段（参数见AlertRuleService._update_params）
+_UPDATE_RULE_SQL = """
+UPDATE alert_rule SET
+    service_type = ?, channel_id = ?, data_type = ?, point_id = ?, rule_name = ?,
+    warning_level = ?, operator = ?, value = ?, enabled = ?,
+    description = ?, updated_at = CURRENT_TIMESTAMP
+WHERE id = ?
+"""
+
+
+def _encode_rule_cursor(created_at: Optional[int], rule_id: int) -> str:
+    """将分页位置编码为游标字符串"""
+    raw = f"{created_at or 0}|{rule_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_rule_cursor(cursor: str) -> Tuple[int, int]:
+    """解析游标字符串，格式错误时抛出ValueError"""
+    try:
+        created_at, rule_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return int(created_at), int(rule_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
 
 class AlertRuleService:
     """告警规则服务类"""
     
     def __init__(self):
         self.db_manager = get_db_manager()
+        # 按ID缓存规则，规则被修改、删除、启用或禁用时失效
+        # 多进程部署时其他进程无法感知本进程的修改，不启用进程内缓存
+        self._rule_cache_enabled = settings.DEBUG or settings.UVICORN_WORKERS <= 1
+        self._rule_cache: TTLCache = TTLCache(maxsize=RULE_CACHE_MAXSIZE, ttl=RULE_CACHE_TTL)
+        self._rule_cache_lock = threading.Lock()
+        # 串行化"查重+创建"，避免并发请求为同一点位重复创建规则
+        self._create_lock = threading.Lock()
     
     def create_rule(self, rule: AlertRule) -> Optional[int]:
         """创建新的告警规则"""
@@ -27,7 +75,7 @@ class AlertRuleService:
                 return None
             
             # 设置创建时间（使用时间戳）
-            now = int(datetime.now().timestamp())
+            now = int(time.time())
             rule.created_at = now
             rule.updated_at = now
             
@@ -62,15 +110,38 @@ class AlertRuleService:
             logger.error(f"创建告警规则失败: {e}")
             return None
     
+    def create_rule_if_absent(self, rule: AlertRule) -> Tuple[Optional[AlertRule], Optional[int]]:
+        """
+        同一点位（服务类型、通道、数据类型、点位）不存在规则时创建
+        
+        Returns:
+            (已存在的规则, 新规则ID)，已存在时新规则ID为None
+        """
+        with self._create_lock:
+            existing_rules = self.get_rules_by_service_channel_point(
+                rule.service_type, rule.channel_id, rule.data_type, rule.point_id
+            )
+            if existing_rules:
+                return existing_rules[0], None
+            return None, self.create_rule(rule)
+    
     def get_rule_by_id(self, rule_id: int) -> Optional[AlertRule]:
-        """根据ID获取告警规则"""
+        """根据ID获取告警规则（单进程部署时短时缓存）"""
+        rule = self._get_cached_rule(rule_id)
+        if rule is not None:
+            return rule
+        
         try:
             sql = "SELECT * FROM alert_rule WHERE id = ?"
             results = self.db_manager.execute_query(sql, (rule_id,))
             
             if results:
                 row = results[0]
-                return self._row_to_alert_rule(row)
+                rule = self._row_to_alert_rule(row)
+                if self._rule_cache_enabled:
+                    with self._rule_cache_lock:
+                        self._rule_cache[rule_id] = rule
+                return rule
             
             return None
             
@@ -119,6 +190,18 @@ class AlertRuleService:
             logger.error(f"获取通道告警规则失败: {e}")
             return []
     
+    def get_rules_by_channel_and_service(self, channel_id: int, service_type: str) -> List[AlertRule]:
+        """根据通道ID和服务类型获取告警规则"""
+        try:
+            sql = "SELECT * FROM alert_rule WHERE channel_id = ? AND service_type = ? ORDER BY created_at"
+            results = self.db_manager.execute_query(sql, (channel_id, service_type))
+            
+            return [self._row_to_alert_rule(row) for row in results]
+            
+        except Exception as e:
+            logger.error(f"获取通道告警规则失败: {e}")
+            return []
+    
     def update_rule(self, rule: AlertRule) -> bool:
         """更新告警规则"""
         try:
@@ -126,29 +209,9 @@ class AlertRuleService:
                 logger.error("规则验证失败或缺少ID")
                 return False
             
-            sql = """
-            UPDATE alert_rule SET
-                service_type = ?, channel_id = ?, data_type = ?, point_id = ?, rule_name = ?,
-                warning_level = ?, operator = ?, value = ?, enabled = ?,
-                description = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """
-            
-            params = (
-                rule.service_type,
-                rule.channel_id,
-                rule.data_type,
-                rule.point_id,
-                rule.rule_name,
-                rule.warning_level,
-                rule.operator,
-                rule.value,
-                rule.enabled,
-                rule.description,
-                rule.id
-            )
+            affected_rows = self.db_manager.execute_update(_UPDATE_RULE_SQL, self._update_params(rule))
             
-            affected_rows = self.db_manager.execute_update(sql, params)
+            self._invalidate_rule_cache(rule.id)
             
             if affected_rows > 0:
                 logger.info(f"更新告警规则成功，ID: {rule.id}")
@@ -161,12 +224,31 @@ class AlertRuleService:
             logger.error(f"更新告警规则失败: {e}")
             return False
     
+    @staticmethod
+    def _update_params(rule: AlertRule) -> tuple:
+        """_UPDATE_RULE_SQL的参数"""
+        return (
+            rule.service_type,
+            rule.channel_id,
+            rule.data_type,
+            rule.point_id,
+            rule.rule_name,
+            rule.warning_level,
+            rule.operator,
+            rule.value,
+            rule.enabled,
+            rule.description,
+            rule.id
+        )
+    
     def delete_rule(self, rule_id: int) -> bool:
         """删除告警规则"""
         try:
             sql = "DELETE FROM alert_rule WHERE id = ?"
             affected_rows = self.db_manager.execute_delete(sql, (rule_id,))
             
+            self._invalidate_rule_cache(rule_id)
+            
             if affected_rows > 0:
                 logger.info(f"删除告警规则成功，ID: {rule_id}")
                 return True
@@ -184,6 +266,8 @@ class AlertRuleService:
             sql = "UPDATE alert_rule SET enabled = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
             affected_rows = self.db_manager.execute_update(sql, (rule_id,))
             
+            self._invalidate_rule_cache(rule_id)
+            
             if affected_rows > 0:
                 logger.info(f"启用告警规则成功，ID: {rule_id}")
                 return True
@@ -201,6 +285,8 @@ class AlertRuleService:
             sql = "UPDATE alert_rule SET enabled = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
             affected_rows = self.db_manager.execute_update(sql, (rule_id,))
             
+            self._invalidate_rule_cache(rule_id)
+            
             if affected_rows > 0:
                 logger.info(f"禁用告警规则成功，ID: {rule_id}")
                 return True
@@ -212,6 +298,87 @@ class AlertRuleService:
             logger.error(f"禁用告警规则失败: {e}")
             return False
     
+    def bulk_apply(self, updates: List[AlertRule], delete_ids: List[int], enable_ids: List[int],
+                   disable_ids: List[int]) -> Optional[Tuple[Dict[str, List[int]], List[Alert]]]:
+        """
+        在一个事务中批量更新、启用、禁用和删除告警规则（不存在的规则ID跳过），
+        被禁用和删除的规则的告警在同一事务中解除
+        
+        Returns:
+            (各操作实际处理的规则ID及未找到的规则ID, 被解除的告警)，失败时返回None
+        """
+        try:
+            all_ids = {rule.id for rule in updates}.union(delete_ids, enable_ids, disable_ids)
+            placeholders = ",".join("?" * len(all_ids))
+            
+            with self.db_manager.get_connection() as conn:
+                existing = {
+                    row[0] for row in conn.execute(
+                        f"SELECT id FROM alert_rule WHERE id IN ({placeholders})", tuple(all_ids)
+                    )
+                }
+                
+                result = {
+                    "updated": [rule.id for rule in updates if rule.id in existing],
+                    "enabled": [rule_id for rule_id in enable_ids if rule_id in existing],
+                    "disabled": [rule_id for rule_id in disable_ids if rule_id in existing],
+                    "deleted": [rule_id for rule_id in delete_ids if rule_id in existing],
+                    "not_found": sorted(all_ids - existing)
+                }
+                
+                conn.executemany(
+                    _UPDATE_RULE_SQL,
+                    [self._update_params(rule) for rule in updates if rule.id in existing]
+                )
+                conn.executemany(
+                    "UPDATE alert_rule SET enabled = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    [(rule_id,) for rule_id in result["enabled"]]
+                )
+                conn.executemany(
+                    "UPDATE alert_rule SET enabled = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    [(rule_id,) for rule_id in result["disabled"]]
+                )
+                # 删除规则会级联删除其告警和告警事件（包括此处写入的恢复事件），
+                # 删除前先解除告警是为了取回被解除的告警，供调用方发送恢复广播
+                resolved_alerts = alert_service.resolve_alerts_by_rule_ids(
+                    result["disabled"] + result["deleted"]
+                    + [rule.id for rule in updates if rule.id in existing and not rule.enabled],
+                    conn
+                )
+                conn.executemany(
+                    "DELETE FROM alert_rule WHERE id = ?",
+                    [(rule_id,) for rule_id in result["deleted"]]
+                )
+                conn.commit()
+            
+            with self._rule_cache_lock:
+                for rule_id in all_ids:
+                    self._rule_cache.pop(rule_id, None)
+            if resolved_alerts:
+                alert_service.invalidate_active_count()
+            
+            logger.info(
+                f"批量操作告警规则成功: 更新{len(result['updated'])}条, 启用{len(result['enabled'])}条, "
+                f"禁用{len(result['disabled'])}条, 删除{len(result['deleted'])}条, 解除告警{len(resolved_alerts)}条"
+            )
+            return result, resolved_alerts
+            
+        except Exception as e:
+            logger.error(f"批量操作告警规则失败: {e}")
+            return None
+    
+    def _get_cached_rule(self, rule_id: int) -> Optional[AlertRule]:
+        """从缓存读取规则，未命中或未启用缓存时返回None"""
+        if not self._rule_cache_enabled:
+            return None
+        with self._rule_cache_lock:
+            return self._rule_cache.get(rule_id)
+    
+    def _invalidate_rule_cache(self, rule_id: int):
+        """清除指定规则的缓存"""
+        with self._rule_cache_lock:
+            self._rule_cache.pop(rule_id, None)
+    
     def search_rules(self, 
                     keyword: str = "", 
                     service_type: str = "", 
@@ -223,40 +390,9 @@ class AlertRuleService:
                     page_size: int = 10) -> Dict[str, Any]:
         """高级搜索告警规则"""
         try:
-            conditions = []
-            params = []
-            
-            # 多字段模糊查询
-            if keyword:
-                conditions.append("(rule_name LIKE ? OR description LIKE ? OR CAST(channel_id AS TEXT) LIKE ? OR CAST(point_id AS TEXT) LIKE ?)")
-                keyword_pattern = f"%{keyword}%"
-                params.extend([keyword_pattern, keyword_pattern, keyword_pattern, keyword_pattern])
-            
-            # 服务类型过滤
-            if service_type:
-                conditions.append("service_type = ?")
-                params.append(service_type)
-            
-            # 告警级别过滤
-            if warning_level is not None and warning_level in [1, 2, 3]:
-                conditions.append("warning_level = ?")
-                params.append(warning_level)
-            
-            # 启用状态过滤
-            if enabled is not None:
-                conditions.append("enabled = ?")
-                params.append(1 if enabled else 0)
-            
-            # 时间范围过滤
-            if start_time:
-                conditions.append("created_at >= ?")
-                params.append(int(start_time.timestamp()))
-            
-            if end_time:
-                conditions.append("created_at <= ?")
-                params.append(int(end_time.timestamp()))
-            
-            where_clause = " AND ".join(conditions) if conditions else "1=1"
+            where_clause, params = self._build_rule_where(
+                keyword, service_type, warning_level, enabled, start_time, end_time
+            )
             
             # 分页计算
             offset = (page - 1) * page_size
@@ -297,6 +433,150 @@ class AlertRuleService:
                 }
             }
     
+    def search_rules_keyset(self,
+                            keyword: str = "",
+                            service_type: str = "",
+                            warning_level: Optional[int] = None,
+                            enabled: Optional[bool] = None,
+                            start_time: Optional[datetime] = None,
+                            end_time: Optional[datetime] = None,
+                            cursor: str = "",
+                            page_size: int = 10) -> Dict[str, Any]:
+        """
+        游标（keyset）分页搜索告警规则
+        
+        按创建时间、ID倒序返回，cursor为上一页返回的next_cursor（首页传空字符串），
+        不统计总数，深分页也只需一次索引定位
+        """
+        try:
+            where_clause, params = self._build_rule_where(
+                keyword, service_type, warning_level, enabled, start_time, end_time
+            )
+            
+            if cursor:
+                try:
+                    cursor_created_at, cursor_id = _decode_rule_cursor(cursor)
+                except ValueError:
+                    return {
+                        "success": False,
+                        "message": f"无效的分页游标: {cursor}",
+                        "data": {"list": [], "next_cursor": None}
+                    }
+                where_clause = f"({where_clause}) AND (created_at, id) < (?, ?)"
+                params.extend([cursor_created_at, cursor_id])
+            
+            # 多取一条用于判断是否还有下一页
+            data_sql = f"""
+            SELECT * FROM alert_rule WHERE {where_clause} 
+            ORDER BY created_at DESC, id DESC 
+            LIMIT ?
+            """
+            params.append(page_size + 1)
+            results = self.db_manager.execute_query(data_sql, tuple(params))
+            
+            rules = [self._row_to_alert_rule(row) for row in results[:page_size]]
+            next_cursor = None
+            if len(results) > page_size:
+                last_rule = rules[-1]
+                next_cursor = _encode_rule_cursor(last_rule.created_at, last_rule.id)
+            
+            return {
+                "success": True,
+                "message": f"查询成功，本页 {len(rules)} 条记录",
+                "data": {
+                    "list": [rule.to_dict() for rule in rules],
+                    "next_cursor": next_cursor
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"游标分页搜索告警规则失败: {e}")
+            return {
+                "success": False,
+                "message": f"查询失败: {str(e)}",
+                "data": {
+                    "list": [],
+                    "next_cursor": None
+                }
+            }
+    
+    def search_rules_iter(self,
+                          keyword: str = "",
+                          service_type: str = "",
+                          warning_level: Optional[int] = None,
+                          enabled: Optional[bool] = None,
+                          start_time: Optional[datetime] = None,
+                          end_time: Optional[datetime] = None) -> Iterator[AlertRule]:
+        """
+        逐条返回符合条件的告警规则（按块读取，不整体加载到内存）
+        
+        查询失败时记录日志并重新抛出异常
+        """
+        where_clause, params = self._build_rule_where(
+            keyword, service_type, warning_level, enabled, start_time, end_time
+        )
+        sql = f"SELECT * FROM alert_rule WHERE {where_clause} ORDER BY id ASC"
+        
+        try:
+            with self.db_manager.get_connection(check_same_thread=False) as conn:
+                cursor = conn.execute(sql, tuple(params))
+                while True:
+                    rows = cursor.fetchmany(RULE_ITER_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield self._row_to_alert_rule(row)
+        except Exception as e:
+            logger.error(f"流式查询告警规则失败: {e}")
+            raise e
+    
+    def _build_rule_where(self,
+                          keyword: str = "",
+                          service_type: str = "",
+                          warning_level: Optional[int] = None,
+                          enabled: Optional[bool] = None,
+                          start_time: Optional[datetime] = None,
+                          end_time: Optional[datetime] = None) -> Tuple[str, List[Any]]:
+        """构建alert_rule表的搜索条件"""
+        conditions = []
+        params = []
+        
+        # 多字段模糊查询，优先使用FTS5全文索引，不可用或关键词过短时退回LIKE
+        if keyword and self.db_manager.fts_enabled and len(keyword) >= FTS_MIN_KEYWORD_LENGTH:
+            conditions.append("id IN (SELECT rowid FROM alert_rule_fts WHERE alert_rule_fts MATCH ?)")
+            params.append(fts_phrase(keyword))
+        elif keyword:
+            conditions.append("(rule_name LIKE ? OR description LIKE ? OR CAST(channel_id AS TEXT) LIKE ? OR CAST(point_id AS TEXT) LIKE ?)")
+            keyword_pattern = f"%{keyword}%"
+            params.extend([keyword_pattern, keyword_pattern, keyword_pattern, keyword_pattern])
+        
+        # 服务类型过滤
+        if service_type:
+            conditions.append("service_type = ?")
+            params.append(service_type)
+        
+        # 告警级别过滤
+        if warning_level is not None and warning_level in [1, 2, 3]:
+            conditions.append("warning_level = ?")
+            params.append(warning_level)
+        
+        # 启用状态过滤
+        if enabled is not None:
+            conditions.append("enabled = ?")
+            params.append(1 if enabled else 0)
+        
+        # 时间范围过滤
+        if start_time:
+            conditions.append("created_at >= ?")
+            params.append(int(start_time.timestamp()))
+        
+        if end_time:
+            conditions.append("created_at <= ?")
+            params.append(int(end_time.timestamp()))
+        
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        return where_clause, params
+    
     def get_rule_count(self) -> int:
         """获取告警规则总数"""
         try:
@@ -319,6 +599,17 @@ class AlertRuleService:
             logger.error(f"获取启用规则数量失败: {e}")
             return 0
     
+    def get_counts(self) -> Tuple[int, int]:
+        """一次查询获取告警规则总数和启用数量"""
+        try:
+            sql = "SELECT COUNT(*), COALESCE(SUM(enabled = 1), 0) FROM alert_rule"
+            results = self.db_manager.execute_query(sql)
+            return (results[0][0], results[0][1]) if results else (0, 0)
+            
+        except Exception as e:
+            logger.error(f"获取规则数量失败: {e}")
+            return 0, 0
+    
     def get_rules_with_pagination(self, page: int = 1, page_size: int = 10) -> Dict[str, Any]:
         """获取分页的告警规则列表"""
         try:
@@ -355,6 +646,32 @@ class AlertRuleService:
                 }
             }
 
+    # ==================== 异步接口 ====================
+    # sqlite3为同步驱动，查询放到线程池执行，避免阻塞事件循环
+    
+    async def get_rule_by_id_async(self, rule_id: int) -> Optional[AlertRule]:
+        """根据ID获取告警规则（异步，缓存命中时不切换线程）"""
+        rule = self._get_cached_rule(rule_id)
+        if rule is not None:
+            return rule
+        return await asyncio.to_thread(self.get_rule_by_id, rule_id)
+    
+    async def get_rules_by_channel_async(self, channel_id: int) -> List[AlertRule]:
+        """根据通道ID获取所有告警规则（异步）"""
+        return await asyncio.to_thread(self.get_rules_by_channel, channel_id)
+    
+    async def get_rules_by_channel_and_service_async(self, channel_id: int, service_type: str) -> List[AlertRule]:
+        """根据通道ID和服务类型获取告警规则（异步）"""
+        return await asyncio.to_thread(self.get_rules_by_channel_and_service, channel_id, service_type)
+    
+    async def search_rules_async(self, **kwargs) -> Dict[str, Any]:
+        """高级搜索告警规则（异步），参数同search_rules"""
+        return await asyncio.to_thread(self.search_rules, **kwargs)
+    
+    async def search_rules_keyset_async(self, **kwargs) -> Dict[str, Any]:
+        """游标分页搜索告警规则（异步），参数同search_rules_keyset"""
+        return await asyncio.to_thread(self.search_rules_keyset, **kwargs)
+    
     def _row_to_alert_rule(self, row) -> AlertRule:
         """将数据库行转换为AlertRule对象"""
         # SQLite Row对象访问方式
@@ -4,24 +4,69 @@
 """
 
 import logging
-import json
-import csv
-import io
+import orjson
+import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 from app.models.alert import Alert, AlertEvent
 from app.models.alert_rule import AlertRule
-from app.core.database import get_db_manager
+from app.core.database import FTS_MIN_KEYWORD_LENGTH, fts_phrase, get_db_manager
 
 logger = logging.getLogger(__name__)
 
+# 活跃告警数量缓存有效期（秒）
+ACTIVE_COUNT_CACHE_TTL = 2.0
+
+# 流式CSV导出每块的行数（较小的块让首字节尽快发出）
+CSV_STREAM_CHUNK_SIZE = 1000
+
+# CSV导出表头（英文，除规则名称外）
+CSV_EXPORT_HEADERS = [
+    'Event ID', 'Rule ID', 'Rule Name', 'Service Type', 'Channel ID',
+    'Data Type', 'Point ID', 'Warning Level', 'Operator', 'Threshold',
+    'Trigger Value', 'Recovery Value', 'Event Type', 'Triggered At',
+    'Recovered At', 'Duration (Seconds)'
+]
+
+# 各过滤项对应的查询条件（生效时按此处顺序拼接）
+_FILTER_CONDITIONS = {
+    "keyword_fts": "id IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)",
+    "keyword_like": "(rule_name LIKE ? OR CAST(channel_id AS TEXT) LIKE ? OR CAST(point_id AS TEXT) LIKE ?)",
+    "service_type": "service_type = ?",
+    "warning_level": "warning_level = ?",
+    "event_type": "event_type = ?",
+    "start_time": "triggered_at >= ?",
+    "end_time": "triggered_at <= ?",
+}
+
+# 各表固定的查询条件
+_BASE_CONDITIONS = {
+    "alert": ("status = 'active'",),
+}
+
+# WHERE模板缓存：(表名, 生效过滤项集合) -> WHERE子句
+_WHERE_TEMPLATES: Dict[Tuple[str, frozenset], str] = {}
+
+
+def _to_epoch(value: Union[datetime, int]) -> int:
+    """将时间转换为秒级时间戳，已是时间戳时直接返回"""
+    return value if isinstance(value, int) else int(value.timestamp())
+
 
 class AlertService:
     """告警服务类"""
     
     def __init__(self):
         self.db_manager = get_db_manager()
+        # 活跃告警数量缓存: (时间戳, 数量)，读取无锁，写入加锁
+        self._active_count_cache = (0.0, None)
+        self._active_count_lock = threading.Lock()
     
     # ==================== Alert CRUD ====================
     
@@ -34,16 +79,16 @@ class AlertService:
                 logger.warning(f"规则ID {rule.id} 的告警已存在，不重复创建")
                 return existing.id
             
-            now = int(datetime.now().timestamp())
+            now = int(time.time())
             
             # 创建规则快照
-            rule_snapshot = json.dumps({
+            rule_snapshot = orjson.dumps({
                 "rule_name": rule.rule_name,
                 "warning_level": rule.warning_level,
                 "operator": rule.operator,
                 "value": rule.value,
                 "description": rule.description
-            })
+            }).decode()
             
             sql = """
             INSERT INTO alert (
@@ -60,6 +105,7 @@ class AlertService:
             )
             
             alert_id = self.db_manager.execute_insert(sql, params)
+            self.invalidate_active_count()
             logger.info(f"创建告警成功，ID: {alert_id}, 规则: {rule.rule_name}")
             return alert_id
             
@@ -111,16 +157,14 @@ class AlertService:
             ORDER BY warning_level DESC, triggered_at DESC 
             LIMIT ? OFFSET ?
             """
-            results = self.db_manager.execute_query(data_sql, (page_size, offset))
-            
-            alerts = [self._row_to_alert(row) for row in results]
+            rows = self.db_manager.execute_iter(data_sql, (page_size, offset))
             
             return {
                 "success": True,
                 "message": f"查询成功，共找到 {total} 条活跃告警",
                 "data": {
                     "total": total,
-                    "list": [alert.to_dict() for alert in alerts]
+                    "list": [self._row_to_alert_dict(row) for row in rows]
                 }
             }
             
@@ -133,40 +177,22 @@ class AlertService:
             }
     
     def search_alerts(self, keyword: str = "", warning_level: Optional[int] = None,
-                     service_type: str = "", start_time: Optional[datetime] = None,
-                     end_time: Optional[datetime] = None, page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+                     service_type: str = "", start_time: Optional[Union[datetime, int]] = None,
+                     end_time: Optional[Union[datetime, int]] = None, page: int = 1, page_size: int = 10) -> Dict[str, Any]:
         """搜索告警"""
         try:
-            conditions = ["status = 'active'"]
-            params = []
-            
-            if keyword:
-                conditions.append("(rule_name LIKE ? OR CAST(channel_id AS TEXT) LIKE ? OR CAST(point_id AS TEXT) LIKE ?)")
-                keyword_pattern = f"%{keyword}%"
-                params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
-            
-            if service_type:
-                conditions.append("service_type = ?")
-                params.append(service_type)
-            
-            if warning_level is not None and warning_level in [1, 2, 3]:
-                conditions.append("warning_level = ?")
-                params.append(warning_level)
-            
-            if start_time:
-                conditions.append("triggered_at >= ?")
-                params.append(int(start_time.timestamp()))
-            
-            if end_time:
-                conditions.append("triggered_at <= ?")
-                params.append(int(end_time.timestamp()))
-            
-            where_clause = " AND ".join(conditions)
+            where_clause, params = self._build_alert_where("alert", {
+                "keyword": keyword,
+                "service_type": service_type,
+                "warning_level": warning_level,
+                "start_time": start_time,
+                "end_time": end_time,
+            })
             offset = (page - 1) * page_size
             
             # 查询总数
             count_sql = f"SELECT COUNT(*) FROM alert WHERE {where_clause}"
-            count_result = self.db_manager.execute_query(count_sql, tuple(params))
+            count_result = self.db_manager.execute_query(count_sql, params)
             total = count_result[0][0] if count_result else 0
             
             # 查询数据
@@ -175,17 +201,15 @@ class AlertService:
             ORDER BY warning_level ASC, triggered_at DESC 
             LIMIT ? OFFSET ?
             """
-            data_params = list(params) + [page_size, offset]
-            results = self.db_manager.execute_query(data_sql, tuple(data_params))
-            
-            alerts = [self._row_to_alert(row) for row in results]
+            data_params = params + (page_size, offset)
+            rows = self.db_manager.execute_iter(data_sql, data_params)
             
             return {
                 "success": True,
                 "message": f"查询成功，共找到 {total} 条记录",
                 "data": {
                     "total": total,
-                    "list": [alert.to_dict() for alert in alerts]
+                    "list": [self._row_to_alert_dict(row) for row in rows]
                 }
             }
             
@@ -198,15 +222,27 @@ class AlertService:
             }
     
     def get_active_alert_count(self) -> int:
-        """获取活跃告警数量"""
+        """获取活跃告警数量（带短时缓存）"""
+        cached_at, cached_count = self._active_count_cache
+        if cached_count is not None and time.monotonic() - cached_at < ACTIVE_COUNT_CACHE_TTL:
+            return cached_count
+        
         try:
             sql = "SELECT COUNT(*) FROM alert WHERE status = 'active'"
             result = self.db_manager.execute_query(sql)
-            return result[0][0] if result else 0
+            count = result[0][0] if result else 0
+            with self._active_count_lock:
+                self._active_count_cache = (time.monotonic(), count)
+            return count
         except Exception as e:
             logger.error(f"获取活跃告警数量失败: {e}")
             return 0
     
+    def invalidate_active_count(self):
+        """告警表变更后使活跃告警数量缓存失效"""
+        with self._active_count_lock:
+            self._active_count_cache = (0.0, None)
+    
     def get_active_alert_count_by_level(self) -> Dict[str, int]:
         """获取按等级分类的活跃告警数量"""
         try:
@@ -301,6 +337,7 @@ class AlertService:
                     delete_cursor = conn.execute("DELETE FROM alert WHERE id = ?", (alert_id,))
                     if delete_cursor.rowcount > 0:
                         conn.commit()
+                        self.invalidate_active_count()
                         logger.info(f"告警已解除，ID: {alert_id}, 移动到事件表: {event_id}")
                         return True
                     else:
@@ -316,65 +353,75 @@ class AlertService:
     
     def resolve_alerts_by_rule_id(self, rule_id: int) -> List[Alert]:
         """根据规则ID解除所有相关告警（规则被禁用/删除时使用）"""
-        resolved_alerts = []
+        return self.resolve_alerts_by_rule_ids([rule_id])
+    
+    def resolve_alerts_by_rule_ids(self, rule_ids: List[int],
+                                   conn: Optional[sqlite3.Connection] = None) -> List[Alert]:
+        """
+        根据多个规则ID批量解除相关告警，在单个事务内完成
+        
+        传入conn时在调用方的事务中执行：不提交，出错时抛出异常由调用方回滚，
+        调用方提交后需调用invalidate_active_count
+        """
+        if not rule_ids:
+            return []
+        
+        if conn is not None:
+            return self._resolve_alerts(conn, rule_ids)
+        
         try:
             # 使用事务确保数据一致性
             with self.db_manager.get_connection() as conn:
-                # 获取相关的告警
-                cursor = conn.execute("SELECT * FROM alert WHERE rule_id = ?", (rule_id,))
-                results = cursor.fetchall()
-                
-                if not results:
-                    logger.info(f"规则ID {rule_id} 没有相关告警需要解除")
-                    return resolved_alerts
+                conn.execute("BEGIN IMMEDIATE")
+                resolved_alerts = self._resolve_alerts(conn, rule_ids)
                 
-                # 在事务中处理所有告警
-                for row in results:
-                    alert = self._row_to_alert(row)
-                    
-                    # 创建事件记录（规则变更触发的解除）
-                    event = AlertEvent.from_alert(alert, "recovery", None)
-                    
-                    # 插入AlertEvent记录
-                    event_sql = """
-                    INSERT INTO alert_event (
-                        rule_id, rule_snapshot, service_type, channel_id, data_type, point_id,
-                        rule_name, warning_level, operator, threshold_value, trigger_value,
-                        recovery_value, event_type, triggered_at, recovered_at, duration
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    
-                    event_params = (
-                        event.rule_id, event.rule_snapshot, event.service_type, event.channel_id,
-                        event.data_type, event.point_id, event.rule_name, event.warning_level,
-                        event.operator, event.threshold_value, event.trigger_value, event.recovery_value,
-                        event.event_type, event.triggered_at, event.recovered_at, event.duration
-                    )
-                    
-                    cursor = conn.execute(event_sql, event_params)
-                    event_id = cursor.lastrowid
-                    
-                    if event_id:
-                        # 删除告警记录
-                        delete_cursor = conn.execute("DELETE FROM alert WHERE id = ?", (alert.id,))
-                        if delete_cursor.rowcount > 0:
-                            resolved_alerts.append(alert)
-                            logger.debug(f"告警已解除: ID={alert.id}, 规则={alert.rule_name}, 事件ID={event_id}")
-                        else:
-                            logger.warning(f"删除告警记录失败: ID={alert.id}")
-                    else:
-                        logger.error(f"创建告警事件记录失败: ID={alert.id}")
-                        raise Exception(f"创建告警事件记录失败: ID={alert.id}")
+                if not resolved_alerts:
+                    conn.rollback()
+                    logger.info(f"规则ID {rule_ids} 没有相关告警需要解除")
+                    return []
                 
                 # 提交事务
                 conn.commit()
-                logger.info(f"规则ID {rule_id} 相关的 {len(resolved_alerts)} 条告警已解除")
+                self.invalidate_active_count()
+                logger.info(f"规则ID {rule_ids} 相关的 {len(resolved_alerts)} 条告警已解除")
                 return resolved_alerts
             
         except Exception as e:
             logger.error(f"批量解除告警失败: {e}")
             return []
     
+    def _resolve_alerts(self, conn: sqlite3.Connection, rule_ids: List[int]) -> List[Alert]:
+        """在给定连接上写入恢复事件并删除告警记录（不提交），返回被解除的告警"""
+        placeholders = ",".join("?" * len(rule_ids))
+        params = tuple(rule_ids)
+        now = int(time.time())
+        
+        # 获取相关的告警（返回给调用方用于发送恢复广播）
+        cursor = conn.execute(f"SELECT * FROM alert WHERE rule_id IN ({placeholders})", params)
+        resolved_alerts = [self._row_to_alert(row) for row in cursor]
+        if not resolved_alerts:
+            return []
+        
+        # 批量写入恢复事件（规则变更触发的解除，无恢复值）
+        event_sql = f"""
+        INSERT INTO alert_event (
+            rule_id, rule_snapshot, service_type, channel_id, data_type, point_id,
+            rule_name, warning_level, operator, threshold_value, trigger_value,
+            recovery_value, event_type, triggered_at, recovered_at, duration
+        )
+        SELECT
+            rule_id, rule_snapshot, service_type, channel_id, data_type, point_id,
+            rule_name, warning_level, operator, threshold_value, current_value,
+            NULL, 'recovery', triggered_at, ?,
+            CASE WHEN triggered_at THEN ? - triggered_at ELSE NULL END
+        FROM alert WHERE rule_id IN ({placeholders})
+        """
+        conn.execute(event_sql, (now, now) + params)
+        
+        # 删除告警记录
+        conn.execute(f"DELETE FROM alert WHERE rule_id IN ({placeholders})", params)
+        return resolved_alerts
+    
     # ==================== AlertEvent CRUD ====================
     
     def create_alert_event(self, event: AlertEvent) -> Optional[int]:
@@ -405,44 +452,23 @@ class AlertService:
     
     def get_alert_events(self, keyword: str = "", warning_level: Optional[int] = None,
                         service_type: str = "", event_type: str = "",
-                        start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                        start_time: Optional[Union[datetime, int]] = None, end_time: Optional[Union[datetime, int]] = None,
                         page: int = 1, page_size: int = 10) -> Dict[str, Any]:
         """查询告警事件历史"""
         try:
-            conditions = []
-            params = []
-            
-            if keyword:
-                conditions.append("(rule_name LIKE ? OR CAST(channel_id AS TEXT) LIKE ? OR CAST(point_id AS TEXT) LIKE ?)")
-                keyword_pattern = f"%{keyword}%"
-                params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
-            
-            if service_type:
-                conditions.append("service_type = ?")
-                params.append(service_type)
-            
-            if warning_level is not None and warning_level in [1, 2, 3]:
-                conditions.append("warning_level = ?")
-                params.append(warning_level)
-            
-            if event_type and event_type in ["trigger", "recovery"]:
-                conditions.append("event_type = ?")
-                params.append(event_type)
-            
-            if start_time:
-                conditions.append("triggered_at >= ?")
-                params.append(int(start_time.timestamp()))
-            
-            if end_time:
-                conditions.append("triggered_at <= ?")
-                params.append(int(end_time.timestamp()))
-            
-            where_clause = " AND ".join(conditions) if conditions else "1=1"
+            where_clause, params = self._build_alert_where("alert_event", {
+                "keyword": keyword,
+                "service_type": service_type,
+                "warning_level": warning_level,
+                "event_type": event_type,
+                "start_time": start_time,
+                "end_time": end_time,
+            })
             offset = (page - 1) * page_size
             
             # 查询总数
             count_sql = f"SELECT COUNT(*) FROM alert_event WHERE {where_clause}"
-            count_result = self.db_manager.execute_query(count_sql, tuple(params))
+            count_result = self.db_manager.execute_query(count_sql, params)
             total = count_result[0][0] if count_result else 0
             
             # 查询数据
@@ -451,17 +477,15 @@ class AlertService:
             ORDER BY triggered_at DESC 
             LIMIT ? OFFSET ?
             """
-            data_params = list(params) + [page_size, offset]
-            results = self.db_manager.execute_query(data_sql, tuple(data_params))
-            
-            events = [self._row_to_alert_event(row) for row in results]
+            data_params = params + (page_size, offset)
+            rows = self.db_manager.execute_iter(data_sql, data_params)
             
             return {
                 "success": True,
                 "message": f"查询成功，共找到 {total} 条记录",
                 "data": {
                     "total": total,
-                    "list": [event.to_dict() for event in events]
+                    "list": [self._row_to_event_dict(row) for row in rows]
                 }
             }
             
@@ -473,107 +497,87 @@ class AlertService:
                 "data": {"total": 0, "list": []}
             }
     
-    def export_alert_events_csv(self, keyword: str = "", warning_level: Optional[int] = None,
-                               service_type: str = "", event_type: str = "",
-                               start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> str:
-        """导出告警事件历史为CSV格式"""
+    def iter_alert_events_csv(self, keyword: str = "", warning_level: Optional[int] = None,
+                              service_type: str = "", event_type: str = "",
+                              start_time: Optional[Union[datetime, int]] = None,
+                              end_time: Optional[Union[datetime, int]] = None) -> Iterator[bytes]:
+        """
+        分块导出告警事件历史CSV（UTF-8字节，首块包含表头，不含BOM）
+        
+        每次从数据库读取CSV_STREAM_CHUNK_SIZE行并立即生成，内存占用与结果集大小无关
+        """
+        data_sql, params = self._build_export_query(
+            keyword, warning_level, service_type, event_type, start_time, end_time
+        )
+        
         try:
-            conditions = []
-            params = []
-            
-            # 构建查询条件（与get_alert_events相同）
-            if keyword:
-                conditions.append("(rule_name LIKE ? OR CAST(channel_id AS TEXT) LIKE ? OR CAST(point_id AS TEXT) LIKE ?)")
-                keyword_pattern = f"%{keyword}%"
-                params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
-            
-            if service_type:
-                conditions.append("service_type = ?")
-                params.append(service_type)
-            
-            if warning_level is not None and warning_level in [1, 2, 3]:
-                conditions.append("warning_level = ?")
-                params.append(warning_level)
-            
-            if event_type and event_type in ["trigger", "recovery"]:
-                conditions.append("event_type = ?")
-                params.append(event_type)
-            
-            if start_time:
-                conditions.append("triggered_at >= ?")
-                params.append(int(start_time.timestamp()))
-            
-            if end_time:
-                conditions.append("triggered_at <= ?")
-                params.append(int(end_time.timestamp()))
-            
-            where_clause = " AND ".join(conditions) if conditions else "1=1"
-            
-            # 查询所有符合条件的数据（无分页限制）
-            data_sql = f"""
-            SELECT * FROM alert_event WHERE {where_clause} 
-            ORDER BY triggered_at DESC
-            """
-            results = self.db_manager.execute_query(data_sql, tuple(params))
-            
-            # 创建CSV内容
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # 写入表头（英文，除规则名称外）
-            headers = [
-                'Event ID', 'Rule ID', 'Rule Name', 'Service Type', 'Channel ID', 
-                'Data Type', 'Point ID', 'Warning Level', 'Operator', 'Threshold',
-                'Trigger Value', 'Recovery Value', 'Event Type', 'Triggered At', 
-                'Recovered At', 'Duration (Seconds)'
-            ]
-            writer.writerow(headers)
-            
-            # 写入数据行
-            for row in results:
-                event = self._row_to_alert_event(row)
-                
-                # 格式化数据（保持原始格式）
-                warning_level_value = event.warning_level  # 保持数字 1/2/3
-                event_type_value = event.event_type  # 保持英文 trigger/recovery  
-                data_type_value = event.data_type  # 保持单字母 T/S/C/A
-                
-                # 时间格式化
-                triggered_at_str = datetime.fromtimestamp(event.triggered_at).strftime("%Y-%m-%d %H:%M:%S") if event.triggered_at else ""
-                recovered_at_str = datetime.fromtimestamp(event.recovered_at).strftime("%Y-%m-%d %H:%M:%S") if event.recovered_at else ""
-                
-                # 持续时间保持秒数
-                duration_value = event.duration if event.duration is not None else ""
-                
-                writer.writerow([
-                    event.id,
-                    event.rule_id,
-                    event.rule_name,  # 保持中文规则名称
-                    event.service_type,
-                    event.channel_id,
-                    data_type_value,  # T/S/C/A
-                    event.point_id,
-                    warning_level_value,  # 1/2/3
-                    event.operator,
-                    event.threshold_value,
-                    event.trigger_value,
-                    event.recovery_value if event.recovery_value is not None else "",
-                    event_type_value,  # trigger/recovery
-                    triggered_at_str,
-                    recovered_at_str,
-                    duration_value  # 移除备注列
-                ])
-            
-            csv_content = output.getvalue()
-            output.close()
-            
-            logger.info(f"成功导出 {len(results)} 条告警事件记录")
-            return csv_content
-            
+            # 流式响应会在不同线程中推进生成器，连接需允许跨线程使用
+            with self.db_manager.get_connection(check_same_thread=False) as conn:
+                cursor = conn.execute(data_sql, params)
+                for chunk in self._iter_csv_chunks(cursor):
+                    yield chunk.encode("utf-8")
         except Exception as e:
             logger.error(f"导出告警事件CSV失败: {e}")
             raise e
+    
+    def _build_export_query(self, keyword: str, warning_level: Optional[int], service_type: str,
+                            event_type: str, start_time: Optional[Union[datetime, int]],
+                            end_time: Optional[Union[datetime, int]]) -> Tuple[str, tuple]:
+        """构建CSV导出查询（过滤条件与get_alert_events相同）"""
+        where_clause, params = self._build_alert_where("alert_event", {
+            "keyword": keyword,
+            "service_type": service_type,
+            "warning_level": warning_level,
+            "event_type": event_type,
+            "start_time": start_time,
+            "end_time": end_time,
+        })
+        
+        # 查询所有符合条件的数据（无分页限制）
+        # 直接在SQL中输出CSV列的最终格式：时间按本地时区格式化，NULL写出为空字符串
+        data_sql = f"""
+        SELECT
+            id, rule_id, rule_name, service_type, channel_id,
+            data_type, point_id, warning_level, operator, threshold_value,
+            trigger_value, recovery_value, event_type,
+            strftime('%Y-%m-%d %H:%M:%S', triggered_at, 'unixepoch', 'localtime'),
+            strftime('%Y-%m-%d %H:%M:%S', recovered_at, 'unixepoch', 'localtime'),
+            duration
+        FROM alert_event WHERE {where_clause} 
+        ORDER BY triggered_at DESC
+        """
+        return data_sql, params
 
+    def _iter_csv_chunks(self, cursor, chunk_size: int = CSV_STREAM_CHUNK_SIZE) -> Iterator[str]:
+        """按块读取查询结果并使用pyarrow向量化写入CSV文本"""
+        total = 0
+        first_chunk = True
+        
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows and not first_chunk:
+                break
+            
+            columns = list(zip(*rows)) if rows else [()] * len(CSV_EXPORT_HEADERS)
+            arrays = []
+            for column in columns:
+                array = pa.array(column)
+                if pa.types.is_floating(array.type):
+                    # pyarrow的浮点格式与str(float)不同（如1.0写出为1），按str(float)预先格式化
+                    array = pa.array([None if value is None else str(value) for value in column], pa.string())
+                arrays.append(array)
+            table = pa.Table.from_arrays(arrays, names=CSV_EXPORT_HEADERS)
+            sink = pa.BufferOutputStream()
+            pacsv.write_csv(table, sink, write_options=pacsv.WriteOptions(include_header=first_chunk))
+            yield sink.getvalue().to_pybytes().decode("utf-8")
+            
+            total += len(rows)
+            first_chunk = False
+            if not rows:
+                break
+        
+        logger.info(f"成功导出 {total} 条告警事件记录")
+    
     def get_alert_statistics(self) -> Dict[str, Any]:
         """获取告警统计信息"""
         try:
@@ -620,6 +624,64 @@ class AlertService:
     
     # ==================== Helper Methods ====================
     
+    def _build_alert_where(self, table: str, filters: Dict[str, Any]) -> Tuple[str, tuple]:
+        """
+        构建alert/alert_event表的查询条件
+        
+        WHERE模板按表名和生效的过滤项缓存，参数按固定顺序拼装，
+        相同过滤组合始终生成同一条SQL
+        """
+        active_keys = []
+        params = []
+        
+        keyword = filters.get("keyword")
+        if keyword:
+            # 优先使用FTS5全文索引，不可用或关键词过短时退回LIKE
+            if self.db_manager.fts_enabled and len(keyword) >= FTS_MIN_KEYWORD_LENGTH:
+                active_keys.append("keyword_fts")
+                params.append(fts_phrase(keyword))
+            else:
+                active_keys.append("keyword_like")
+                keyword_pattern = f"%{keyword}%"
+                params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
+        
+        service_type = filters.get("service_type")
+        if service_type:
+            active_keys.append("service_type")
+            params.append(service_type)
+        
+        warning_level = filters.get("warning_level")
+        if warning_level is not None and warning_level in [1, 2, 3]:
+            active_keys.append("warning_level")
+            params.append(warning_level)
+        
+        event_type = filters.get("event_type")
+        if event_type and event_type in ["trigger", "recovery"]:
+            active_keys.append("event_type")
+            params.append(event_type)
+        
+        start_time = filters.get("start_time")
+        if start_time is not None:
+            active_keys.append("start_time")
+            params.append(_to_epoch(start_time))
+        
+        end_time = filters.get("end_time")
+        if end_time is not None:
+            active_keys.append("end_time")
+            params.append(_to_epoch(end_time))
+        
+        template_key = (table, frozenset(active_keys))
+        where_clause = _WHERE_TEMPLATES.get(template_key)
+        if where_clause is None:
+            conditions = list(_BASE_CONDITIONS.get(table, ()))
+            conditions.extend(
+                _FILTER_CONDITIONS[key].format(fts_table=f"{table}_fts") for key in active_keys
+            )
+            where_clause = " AND ".join(conditions) if conditions else "1=1"
+            _WHERE_TEMPLATES[template_key] = where_clause
+        
+        return where_clause, tuple(params)
+    
     def _row_to_alert(self, row) -> Alert:
         """将数据库行转换为Alert对象"""
         return Alert(
@@ -660,6 +722,49 @@ class AlertService:
             recovered_at=row["recovered_at"],  # 直接使用时间戳
             duration=row["duration"],
         )
+    
+    def _row_to_alert_dict(self, row) -> Dict[str, Any]:
+        """将数据库行直接转换为字典（与Alert.to_dict()结构一致，跳过对象构建）"""
+        rule_snapshot = row["rule_snapshot"]
+        return {
+            "id": row["id"],
+            "rule_id": row["rule_id"],
+            "rule_snapshot": orjson.loads(rule_snapshot) if rule_snapshot else {},
+            "service_type": row["service_type"],
+            "channel_id": row["channel_id"],
+            "data_type": row["data_type"],
+            "point_id": row["point_id"],
+            "rule_name": row["rule_name"],
+            "warning_level": row["warning_level"],
+            "operator": row["operator"],
+            "threshold_value": row["threshold_value"],
+            "current_value": row["current_value"],
+            "status": row["status"],
+            "triggered_at": row["triggered_at"],
+        }
+    
+    def _row_to_event_dict(self, row) -> Dict[str, Any]:
+        """将数据库行直接转换为字典（与AlertEvent.to_dict()结构一致，跳过对象构建）"""
+        rule_snapshot = row["rule_snapshot"]
+        return {
+            "id": row["id"],
+            "rule_id": row["rule_id"],
+            "rule_snapshot": orjson.loads(rule_snapshot) if rule_snapshot else {},
+            "service_type": row["service_type"],
+            "channel_id": row["channel_id"],
+            "data_type": row["data_type"],
+            "point_id": row["point_id"],
+            "rule_name": row["rule_name"],
+            "warning_level": row["warning_level"],
+            "operator": row["operator"],
+            "threshold_value": row["threshold_value"],
+            "trigger_value": row["trigger_value"],
+            "recovery_value": row["recovery_value"],
+            "event_type": row["event_type"],
+            "triggered_at": row["triggered_at"],
+            "recovered_at": row["recovered_at"],
+            "duration": row["duration"],
+        }
 
 
 # 创建全局服务实例
@@ -3,10 +3,76 @@
 支持多种时间格式的输入，自动转换为标准格式
 """
 
+import logging
 import re
-from datetime import datetime, time
+import sys
+from functools import lru_cache
+from datetime import datetime, time, timedelta
 from typing import Optional, Union
 
+try:
+    from ciso8601 import parse_datetime as _ciso_parse_datetime
+except ImportError:  # 未安装ciso8601时使用正则+fromisoformat解析
+    _ciso_parse_datetime = None
+
+logger = logging.getLogger(__name__)
+
+# 覆盖所有支持的日期/时间格式：日期、日期+小时、日期+小时分钟、日期+时间、带小数秒（.或,）
+_ISO_PAT = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[ T](\d{2})(?::(\d{2})(?::(\d{2})(?:[.,](\d+))?)?)?)?$'
+)
+
+# Python 3.11起datetime.fromisoformat支持空格作为日期时间分隔符
+FROMISO_ACCEPTS_SPACE = sys.version_info >= (3, 11)
+
+# 相对时间关键字
+_RELATIVE_WORDS = {
+    'today': 'today',
+    '今天': 'today',
+    'yesterday': 'yesterday',
+    '昨天': 'yesterday',
+    'now': 'now',
+    '现在': 'now',
+}
+
+# 时间解析结果缓存容量（前端会反复提交相同的时间字符串）
+_PARSE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def _parse_absolute_time(time_str: str) -> Optional[datetime]:
+    """解析绝对时间字符串（结果缓存，datetime不可变可安全共享）"""
+    try:
+        # 一次正则匹配所有日期/时间格式，直接由捕获组构造datetime
+        match = _ISO_PAT.match(time_str)
+        if match:
+            # 已确认是支持的格式后再交给C实现的ciso8601（它还接受2025-08、20250821等格式）
+            if _ciso_parse_datetime is not None:
+                try:
+                    return _ciso_parse_datetime(time_str)
+                except ValueError:
+                    pass
+            year, month, day, hour, minute, second, fraction = match.groups()
+            microsecond = int(fraction[:6].ljust(6, '0')) if fraction else 0
+            return datetime(
+                int(year), int(month), int(day),
+                int(hour or 0), int(minute or 0), int(second or 0), microsecond
+            )
+        
+        # 其他ISO格式（如带时区偏移）交给fromisoformat处理
+        if 'T' in time_str or ' ' in time_str:
+            if FROMISO_ACCEPTS_SPACE:
+                return datetime.fromisoformat(time_str)
+            return datetime.fromisoformat(time_str.replace(' ', 'T'))
+        
+        # 如果都不匹配，返回None
+        return None
+        
+    except ValueError as e:
+        logger.warning(f"时间解析失败: {time_str}, 错误: {e}")
+        return None
+
 class TimeParser:
     """时间解析器，支持多种时间格式"""
     
@@ -29,61 +95,15 @@ class TimeParser:
         
         time_str = time_str.strip()
         
-        try:
-            # 1. 尝试解析完整ISO格式
-            if 'T' in time_str:
-                return datetime.fromisoformat(time_str)
-            
-            # 2. 尝试解析空格分隔格式
-            if ' ' in time_str:
-                return datetime.fromisoformat(time_str.replace(' ', 'T'))
-            
-            # 3. 检查是否为仅日期格式 (YYYY-MM-DD)
-            if re.match(r'^\d{4}-\d{2}-\d{2}$', time_str):
-                # 自动添加时间部分
-                return datetime.fromisoformat(f"{time_str}T00:00:00")
-            
-            # 4. 检查是否为日期+时间格式 (YYYY-MM-DD HH:MM:SS)
-            if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', time_str):
-                return datetime.fromisoformat(time_str.replace(' ', 'T'))
-            
-            # 5. 检查是否为日期+小时格式 (YYYY-MM-DD HH)
-            if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}$', time_str):
-                return datetime.fromisoformat(f"{time_str}:00:00")
-            
-            # 6. 检查是否为日期+小时分钟格式 (YYYY-MM-DD HH:MM)
-            if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$', time_str):
-                return datetime.fromisoformat(f"{time_str}:00")
-            
-            # 7. 处理相对时间
-            if time_str.lower() in ['today', '今天']:
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                return today
-            
-            if time_str.lower() in ['yesterday', '昨天']:
-                from datetime import timedelta
-                yesterday = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-                return yesterday
-            
-            if time_str.lower() in ['now', '现在']:
-                return datetime.now()
-            
-            # 8. 尝试其他可能的格式
-            # 处理 YYYY-MM-DD HH:MM:SS.xxxxxx 格式
-            if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+$', time_str):
-                return datetime.fromisoformat(time_str.replace(' ', 'T'))
-            
-            # 处理 YYYY-MM-DD HH:MM:SS,xxxxxx 格式
-            if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+$', time_str):
-                time_str = time_str.replace(',', '.')
-                return datetime.fromisoformat(time_str.replace(' ', 'T'))
-            
-            # 如果都不匹配，返回None
-            return None
-            
-        except ValueError as e:
-            print(f"时间解析失败: {time_str}, 错误: {e}")
-            return None
+        # 相对时间依赖当前时间，不走缓存
+        relative = _RELATIVE_WORDS.get(time_str.lower())
+        if relative == 'now':
+            return datetime.now()
+        if relative:
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            return today if relative == 'today' else today - timedelta(days=1)
+        
+        return _parse_absolute_time(time_str)
     
     @staticmethod
     def parse_time_range(start_time: Optional[str], end_time: Optional[str]) -> tuple[Optional[datetime], Optional[datetime]]:
@@ -125,6 +145,23 @@ class TimeParser:
         
         return start_dt, end_dt
     
+    @staticmethod
+    def parse_time_range_epoch(start_time: Optional[str], end_time: Optional[str]) -> tuple[Optional[int], Optional[int]]:
+        """
+        解析时间范围并直接返回秒级时间戳，供数据库过滤条件使用
+        
+        Args:
+            start_time: 开始时间字符串
+            end_time: 结束时间字符串
+            
+        Returns:
+            (start_timestamp, end_timestamp) 元组
+        """
+        start_dt, end_dt = TimeParser.parse_time_range(start_time, end_time)
+        start_ts = int(start_dt.timestamp()) if start_dt else None
+        end_ts = int(end_dt.timestamp()) if end_dt else None
+        return start_ts, end_ts
+    
     @staticmethod
     def format_time_for_display(dt: datetime) -> str:
         """格式化时间为显示字符串"""
@@ -158,3 +195,7 @@ def parse_time(time_str: str) -> Optional[datetime]:
 def parse_time_range(start_time: Optional[str], end_time: Optional[str]) -> tuple[Optional[datetime], Optional[datetime]]:
     """解析时间范围"""
     return TimeParser.parse_time_range(start_time, end_time)
+
+def parse_time_range_epoch(start_time: Optional[str], end_time: Optional[str]) -> tuple[Optional[int], Optional[int]]:
+    """解析时间范围并返回时间戳"""
+    return TimeParser.parse_time_range_epoch(start_time, end_time)
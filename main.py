@@ -4,41 +4,110 @@
 """
 
 import logging
+import queue
 import sys
 import os
 import asyncio
+import threading
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Query
+import anyio
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from typing import Optional
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from redis.exceptions import RedisError
+from typing import Any, List, Optional
 from datetime import datetime
+import orjson
 import uvicorn
-import io
+import time
+import zlib
 
+from app.core.cache import (
+    ALERTS_CACHE_TTL, MONITOR_CACHE_TTL, RULES_CACHE_TTL,
+    cache_key, cached, init_cache, invalidate
+)
 from app.core.config import settings
-from app.core.database import init_database
-from app.services.alert_rule_service import alert_rule_service
+from app.core.database import init_database, load_database
+from app.core.redis_client import close_redis_client, create_redis_client
+from app.services.alert_rule_service import RULE_ITER_CHUNK_SIZE, alert_rule_service
 from app.services.alert_service import alert_service
 from app.services.alarm_monitor import alarm_monitor
-from app.models.alert_rule import AlertRule
+from app.models.alert_rule import AlertRule, AlertRuleIn
+from app.utils.time_parser import parse_time_range, parse_time_range_epoch
+
+# 预先绑定规则服务方法，请求处理时省去属性查找（读接口使用异步版本）
+_create_rule_if_absent = alert_rule_service.create_rule_if_absent
+_get_rule = alert_rule_service.get_rule_by_id_async
+_update_rule = alert_rule_service.update_rule
+_delete_rule = alert_rule_service.delete_rule
+_enable_rule = alert_rule_service.enable_rule
+_disable_rule = alert_rule_service.disable_rule
+_bulk_apply_rules = alert_rule_service.bulk_apply
+_search_rules = alert_rule_service.search_rules_async
+_search_rules_keyset = alert_rule_service.search_rules_keyset_async
+_iter_rules = alert_rule_service.search_rules_iter
+_rules_by_channel = alert_rule_service.get_rules_by_channel_async
+_rules_by_channel_and_service = alert_rule_service.get_rules_by_channel_and_service_async
+_get_rule_counts = alert_rule_service.get_counts
 
-# 配置日志
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+
+# 配置日志：请求处理中只把日志记录放入队列，格式化和写入由后台线程完成
+def _setup_logging() -> QueueListener:
+    """配置队列日志，返回已启动的后台监听器（已配置过时直接复用）"""
+    root_logger = logging.getLogger()
+    # python main.py启动时本文件会以__main__和main各导入一次，只在首次导入时配置
+    for handler in root_logger.handlers:
+        if isinstance(handler, QueueHandler) and getattr(handler, "listener", None) is not None:
+            return handler.listener
+    
+    # 确保日志目录存在
+    log_dir = Path(settings.LOG_FILE).parent
+    if not log_dir.exists():
+        log_dir.mkdir(parents=True, exist_ok=True)
+    
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    file_handler = logging.FileHandler(settings.LOG_FILE, encoding="utf-8")
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stream_handler, file_handler, respect_handler_level=True)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.listener = listener
+    root_logger.setLevel(getattr(logging, settings.LOG_LEVEL))
+    root_logger.addHandler(queue_handler)
+    
+    listener.start()
+    return listener
+
+
+_log_listener = _setup_logging()
 
 logger = logging.getLogger(__name__)
 
+class AppJSONResponse(ORJSONResponse):
+    """orjson响应：在ORJSONResponse默认选项基础上，UTC时间以Z结尾输出"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+        )
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="工业物联网告警服务 - 监控和管理告警规则",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=AppJSONResponse
 )
 
 # 配置CORS
@@ -51,28 +120,153 @@ app.add_middleware(
 )
 
 
+# 告警和告警事件查询接口共用的查询参数
+_KEYWORD_Q = Query("", description="关键词搜索，支持模糊匹配：规则名称、通道ID、点位ID")
+_SERVICE_TYPE_Q = Query("", description="服务类型过滤：comsrv, rulesrv, modsrv等")
+_WARNING_LEVEL_Q = Query(None, description="告警级别过滤：1=一般, 2=重要, 3=紧急")
+_EVENT_TYPE_Q = Query("", description="事件类型过滤：trigger=触发, recovery=恢复")
+_START_Q = Query(None, description="开始时间，支持多种格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等")
+_END_Q = Query(None, description="结束时间，支持多种格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等")
+_PAGE_Q = Query(1, ge=1, description="页码")
+_PAGE_SIZE_Q = Query(10, ge=1, le=100, description="每页大小")
+
+# 告警规则查询接口的查询参数
+_RULE_KEYWORD_Q = Query("", description="关键词搜索，支持模糊匹配：规则名称、描述、通道ID、点位ID")
+_RULE_WARNING_LEVEL_Q = Query(None, description="告警级别过滤：1=低级, 2=中级, 3=高级")
+_ENABLED_Q = Query(None, description="启用状态过滤")
+_RULE_PAGE_Q = Query(1, ge=1, description="页码，从1开始")
+_RULE_PAGE_SIZE_Q = Query(10, ge=1, le=100, description="每页大小，最大100")
+_CURSOR_Q = Query(None, description="游标分页：首页传空字符串，之后传上一页返回的next_cursor；不传则使用page分页")
+
+
+class RuleFilterQuery(BaseModel):
+    """告警规则过滤条件"""
+    keyword: str = ""
+    service_type: str = ""
+    warning_level: Optional[int] = None
+    enabled: Optional[bool] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+
+
+class RuleListQuery(RuleFilterQuery):
+    """告警规则列表查询参数"""
+    page: int = 1
+    page_size: int = 10
+    cursor: Optional[str] = None
+
+
+async def _rule_filter_query(
+    keyword: str = _RULE_KEYWORD_Q,
+    service_type: str = _SERVICE_TYPE_Q,
+    warning_level: Optional[int] = _RULE_WARNING_LEVEL_Q,
+    enabled: Optional[bool] = _ENABLED_Q,
+    start_time: Optional[str] = _START_Q,
+    end_time: Optional[str] = _END_Q
+) -> RuleFilterQuery:
+    """收集告警规则过滤条件（参数已由FastAPI按Query声明校验，不再重复校验）"""
+    return RuleFilterQuery.model_construct(
+        keyword=keyword,
+        service_type=service_type,
+        warning_level=warning_level,
+        enabled=enabled,
+        start_time=start_time,
+        end_time=end_time
+    )
+
+
+async def _rule_list_query(
+    filters: RuleFilterQuery = Depends(_rule_filter_query),
+    page: int = _RULE_PAGE_Q,
+    page_size: int = _RULE_PAGE_SIZE_Q,
+    cursor: Optional[str] = _CURSOR_Q
+) -> RuleListQuery:
+    """收集告警规则列表查询参数"""
+    return RuleListQuery.model_construct(**dict(filters), page=page, page_size=page_size, cursor=cursor)
+
+
+# 多工作进程启动时的数据库初始化锁（锁的值为持有者标识，完成标记与之相同表示初始化成功）
+_INIT_LOCK_KEY = f"{settings.REDIS_PREFIX}init:lock"
+_INIT_DONE_KEY = f"{settings.REDIS_PREFIX}init:done"
+_INIT_DONE_CHANNEL = f"{settings.REDIS_PREFIX}init:done"
+_INIT_LOCK_TTL = 30
+
+
+async def _init_database_once(redis_client) -> bool:
+    """
+    初始化数据库（建表和建索引在线程池中执行，不阻塞事件循环）
+    
+    多工作进程部署时通过Redis锁只由一个进程执行初始化，其余进程等待其完成后只读取数据库状态；
+    Redis不可用、持有锁的进程初始化失败或等待超时时自行初始化（建表语句可重复执行）
+    """
+    if settings.DEBUG or settings.UVICORN_WORKERS <= 1:
+        return await asyncio.to_thread(init_database)
+    
+    token = f"{os.getpid()}:{time.time()}"
+    try:
+        if await redis_client.set(_INIT_LOCK_KEY, token, nx=True, ex=_INIT_LOCK_TTL):
+            success = await asyncio.to_thread(init_database)
+            if success:
+                await redis_client.set(_INIT_DONE_KEY, token, ex=_INIT_LOCK_TTL)
+            # 无论成功与否都通知等待的进程
+            await redis_client.publish(_INIT_DONE_CHANNEL, token)
+            return success
+        
+        if await _wait_for_database_init(redis_client):
+            logger.info("数据库已由其他工作进程初始化")
+            return await asyncio.to_thread(load_database)
+    except RedisError as e:
+        logger.warning(f"数据库初始化锁不可用，由当前进程初始化: {e}")
+    
+    return await asyncio.to_thread(init_database)
+
+
+async def _wait_for_database_init(redis_client) -> bool:
+    """等待持有初始化锁的进程完成，初始化成功返回True"""
+    async with redis_client.pubsub() as pubsub:
+        # 先订阅再检查完成标记，避免错过订阅前发布的通知
+        await pubsub.subscribe(_INIT_DONE_CHANNEL)
+        
+        lock_token = await redis_client.get(_INIT_LOCK_KEY)
+        if lock_token is None:
+            return False
+        
+        deadline = time.monotonic() + _INIT_LOCK_TTL
+        while await redis_client.get(_INIT_DONE_KEY) != lock_token:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is not None and message["data"] == lock_token:
+                # 持有者已结束初始化，完成标记不存在表示初始化失败
+                return await redis_client.get(_INIT_DONE_KEY) == lock_token
+        
+        return True
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化操作"""
     logger.info("启动告警服务...")
     
+    # 创建共用的Redis连接池（监控引擎、响应缓存和初始化锁使用同一个客户端）
+    app.state.redis = create_redis_client()
+    init_cache(app.state.redis)
+    
     # 初始化数据库
     logger.info("初始化数据库...")
-    success = init_database()
+    success = await _init_database_once(app.state.redis)
     if not success:
         logger.error("数据库初始化失败！")
+        _log_listener.stop()
         sys.exit(1)
     
     logger.info("数据库初始化成功")
     
-    # 启动告警监控引擎
+    # 在后台启动告警监控引擎，服务无需等待Redis连接即可开始接收请求
+    # 监控启动失败不影响主服务，就绪状态见/health的monitor_ready
     logger.info("启动告警监控引擎...")
-    try:
-        alarm_monitor.start()
-        logger.info("告警监控引擎启动成功")
-    except Exception as e:
-        logger.error(f"告警监控启动失败: {e}")
-        # 监控启动失败不影响主服务
+    app.state.monitor_task = asyncio.create_task(alarm_monitor.start_async(app.state.redis))
     
     # 记录服务启动信息
     logger.info(f"告警服务启动成功")
@@ -86,134 +280,191 @@ async def shutdown_event():
     """应用关闭时的清理操作"""
     logger.info("关闭告警服务...")
     
-    # 停止告警监控引擎
+    # 停止告警监控引擎（启动尚未完成时先取消）
     try:
+        app.state.monitor_task.cancel()
         await alarm_monitor.stop()
         logger.info("告警监控引擎已停止")
     except Exception as e:
         logger.error(f"停止监控引擎失败: {e}")
     
+    # 关闭Redis连接池
+    try:
+        init_cache(None)
+        await close_redis_client(app.state.redis)
+    except Exception as e:
+        logger.error(f"关闭Redis连接池失败: {e}")
+    
     logger.info("告警服务已关闭")
+    
+    # 输出队列中剩余的日志
+    _log_listener.stop()
+
+
+# 失败响应共用的空数据（只读，序列化时不会被修改）
+_EMPTY_DATA = {}
+_EMPTY_LIST_DATA = {"total": 0, "list": []}
+
+# CSV导出文件开头的UTF-8 BOM
+_CSV_BOM = b"\xef\xbb\xbf"
+
+
+# 根路径响应内容不随请求变化，启动时序列化一次
+_ROOT_BODY = orjson.dumps({
+    "service": settings.APP_NAME,
+    "version": settings.APP_VERSION,
+    "status": "running",
+    "database": settings.DATABASE_PATH,
+})
 
 
 @app.get("/")
 async def root():
     """根路径"""
-    return {
-        "service": settings.APP_NAME,
-        "version": settings.APP_VERSION,
-        "status": "running",
-        "database": settings.DATABASE_PATH,
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
+
+
+# 健康检查规则数量缓存（探针高频调用时避免重复COUNT查询）
+_COUNT_CACHE_TTL = 1.0
+_count_cache = {"ts": 0.0, "total": 0, "enabled": 0}
+# 健康检查响应体缓存，与规则数量缓存同时刷新
+_health_body_cache = {"ts": None, "body": b""}
+
+
+def _get_counts() -> tuple:
+    """获取规则总数和启用数量，1秒内复用缓存结果"""
+    now = time.monotonic()
+    if now - _count_cache["ts"] >= _COUNT_CACHE_TTL:
+        _count_cache["total"], _count_cache["enabled"] = _get_rule_counts()
+        _count_cache["ts"] = now
+    return _count_cache["total"], _count_cache["enabled"]
+
+
+def _build_health_body(monitor_status: dict) -> bytes:
+    """查询规则数量和告警统计，与监控状态一起序列化为健康检查响应体"""
+    # 检查数据库连接
+    rule_count, enabled_count = _get_counts()
+    if _health_body_cache["ts"] == _count_cache["ts"]:
+        return _health_body_cache["body"]
+    
+    # 检查告警统计
+    alert_stats = alert_service.get_alert_statistics()
+    
+    body = orjson.dumps({
+        "status": "healthy",
+        "database": "connected",
+        "rules": {
+            "total": rule_count,
+            "enabled": enabled_count
+        },
+        "alerts": alert_stats.get("data", {}),
+        "monitor": monitor_status,
+        "monitor_ready": alarm_monitor.ready.is_set()
+    })
+    _health_body_cache["body"] = body
+    _health_body_cache["ts"] = _count_cache["ts"]
+    return body
 
 
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
     try:
-        # 检查数据库连接
-        rule_count = alert_rule_service.get_rule_count()
-        enabled_count = alert_rule_service.get_enabled_rule_count()
-        
-        # 检查告警统计
-        alert_stats = alert_service.get_alert_statistics()
-        
-        # 检查监控状态
-        monitor_status = alarm_monitor.get_monitor_status()
-        
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "rules": {
-                "total": rule_count,
-                "enabled": enabled_count
-            },
-            "alerts": alert_stats.get("data", {}),
-            "monitor": monitor_status
-        }
+        # 缓存有效时直接返回，否则在线程池中查询，避免阻塞事件循环
+        if time.monotonic() - _count_cache["ts"] < _COUNT_CACHE_TTL and _health_body_cache["ts"] == _count_cache["ts"]:
+            body = _health_body_cache["body"]
+        else:
+            # 检查监控状态
+            monitor_status = await alarm_monitor.get_monitor_status()
+            body = await asyncio.to_thread(_build_health_body, monitor_status)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         logger.error(f"健康检查失败: {e}")
         raise HTTPException(status_code=500, detail="Service unhealthy")
 
 
+# 创建规则的必需字段 -> 字段名称
+_REQUIRED_RULE_FIELDS = {
+    "channel_id": "通道ID",
+    "data_type": "数据类型",
+    "point_id": "点位ID",
+    "rule_name": "规则名称",
+    "warning_level": "告警级别",
+    "operator": "比较操作符",
+    "value": "阈值"
+}
+# 类型转换失败对应的pydantic错误类型
+_RULE_TYPE_ERRORS = frozenset(("int_type", "int_parsing", "int_from_float", "float_type", "float_parsing"))
+_RULE_EXAMPLE = {
+    "service_type": "comsrv",
+    "channel_id": 1,
+    "data_type": "T",
+    "point_id": 100,
+    "rule_name": "温度告警",
+    "warning_level": 2,
+    "operator": ">",
+    "value": 50.0,
+    "description": "温度超过50度时告警",
+    "enabled": True
+}
+
+
+def _rule_validation_error(exc: ValidationError, rule_data: dict) -> dict:
+    """将规则请求数据的校验错误转换为统一的失败响应"""
+    missing_fields = [
+        f"{field_name}({field})" for field, field_name in _REQUIRED_RULE_FIELDS.items()
+        if rule_data.get(field) is None
+    ]
+    if missing_fields:
+        return {
+            "success": False,
+            "message": f"缺少必需字段: {', '.join(missing_fields)}",
+            "data": {
+                "missing_fields": list(_REQUIRED_RULE_FIELDS),
+                "example": _RULE_EXAMPLE
+            }
+        }
+    
+    errors = exc.errors(include_url=False)
+    type_errors = [error["msg"] for error in errors if error["type"] in _RULE_TYPE_ERRORS]
+    if type_errors:
+        return {
+            "success": False,
+            "message": f"数据类型错误: channel_id、point_id、warning_level必须为整数，value必须为数值",
+            "data": {"type_error": "; ".join(type_errors)}
+        }
+    
+    error_message = "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in errors
+    )
+    return {
+        "success": False,
+        "message": f"规则验证失败: {error_message}",
+        "data": {
+            "validation_error": error_message,
+            "current_data": rule_data
+        }
+    }
+
+
 # 告警规则API端点
-@app.post("/alarmApi/rules", response_model=dict)
+@app.post("/alarmApi/rules")
 async def create_alert_rule(rule_data: dict):
     """创建告警规则"""
     try:
-        # 验证必需字段
-        required_fields = {
-            "channel_id": "通道ID", 
-            "data_type": "数据类型", 
-            "point_id": "点位ID", 
-            "rule_name": "规则名称", 
-            "warning_level": "告警级别", 
-            "operator": "比较操作符", 
-            "value": "阈值"
-        }
-        
-        missing_fields = []
-        for field, field_name in required_fields.items():
-            if field not in rule_data or rule_data[field] is None:
-                missing_fields.append(f"{field_name}({field})")
-        
-        if missing_fields:
-            return {
-                "success": False,
-                "message": f"缺少必需字段: {', '.join(missing_fields)}",
-                "data": {
-                    "missing_fields": list(required_fields.keys()),
-                    "example": {
-                        "service_type": "comsrv",
-                        "channel_id": 1,
-                        "data_type": "T",
-                        "point_id": 100,
-                        "rule_name": "温度告警",
-                        "warning_level": 2,
-                        "operator": ">",
-                        "value": 50.0,
-                        "description": "温度超过50度时告警",
-                        "enabled": True
-                    }
-                }
-            }
-        
-        # 验证数据类型
+        # 必填、类型和取值校验
         try:
-            # 确保数值字段为正确类型
-            rule_data["channel_id"] = int(rule_data["channel_id"])
-            rule_data["point_id"] = int(rule_data["point_id"])
-            rule_data["warning_level"] = int(rule_data["warning_level"])
-            rule_data["value"] = float(rule_data["value"])
-        except (ValueError, TypeError) as e:
-            return {
-                "success": False,
-                "message": f"数据类型错误: channel_id、point_id、warning_level必须为整数，value必须为数值",
-                "data": {"type_error": str(e)}
-            }
+            rule_in = AlertRuleIn.model_validate(rule_data)
+        except ValidationError as e:
+            return _rule_validation_error(e, rule_data)
         
         # 创建AlertRule对象
-        rule = AlertRule.from_dict(rule_data)
-        
-        # 详细验证规则
-        is_valid, error_message = rule.validate_detailed()
-        if not is_valid:
-            return {
-                "success": False,
-                "message": f"规则验证失败: {error_message}",
-                "data": {
-                    "validation_error": error_message,
-                    "current_data": rule_data
-                }
-            }
+        rule = AlertRule(**rule_in.model_dump())
         
-        # 检查是否存在相同的规则配置
-        existing_rules = alert_rule_service.get_rules_by_service_channel_point(
-            rule.service_type, rule.channel_id, rule.data_type, rule.point_id
-        )
+        # 检查是否存在相同的规则配置，不存在时创建
+        existing_rule, rule_id = await asyncio.to_thread(_create_rule_if_absent, rule)
         
-        if existing_rules:
-            existing_rule = existing_rules[0]
+        if existing_rule:
             return {
                 "success": False,
                 "message": f"已存在相同的规则配置 (服务类型:{rule.service_type}, 通道:{rule.channel_id}, 数据类型:{rule.data_type}, 点位:{rule.point_id})",
@@ -228,9 +479,8 @@ async def create_alert_rule(rule_data: dict):
                 }
             }
         
-        # 创建规则
-        rule_id = alert_rule_service.create_rule(rule)
         if rule_id:
+            await invalidate("rules")
             return {
                 "success": True,
                 "message": f"告警规则'{rule.rule_name}'创建成功",
@@ -248,12 +498,6 @@ async def create_alert_rule(rule_data: dict):
                 "data": {"database_error": "insert operation failed"}
             }
             
-    except KeyError as e:
-        return {
-            "success": False,
-            "message": f"请求数据格式错误，缺少字段: {str(e)}",
-            "data": {"format_error": str(e)}
-        }
     except ValueError as e:
         return {
             "success": False,
@@ -269,28 +513,111 @@ async def create_alert_rule(rule_data: dict):
         }
 
 
+@app.get("/alarmApi/rules/stream")
+async def stream_alert_rules(q: RuleFilterQuery = Depends(_rule_filter_query)):
+    """以NDJSON格式流式返回符合条件的全部告警规则（每行一条规则）"""
+    start_datetime, end_datetime = parse_time_range(q.start_time, q.end_time)
+    
+    if q.start_time and not start_datetime:
+        return {
+            "success": False,
+            "message": f"开始时间格式错误: {q.start_time}，支持格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等",
+            "data": _EMPTY_LIST_DATA
+        }
+    
+    if q.end_time and not end_datetime:
+        return {
+            "success": False,
+            "message": f"结束时间格式错误: {q.end_time}，支持格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等",
+            "data": _EMPTY_LIST_DATA
+        }
+    
+    rules = _iter_rules(
+        keyword=q.keyword,
+        service_type=q.service_type,
+        warning_level=q.warning_level,
+        enabled=q.enabled,
+        start_time=start_datetime,
+        end_time=end_datetime
+    )
+    
+    # 生成器在线程池中推进，加锁避免关闭时与仍在执行的next并发
+    rules_lock = threading.Lock()
+    
+    def next_lines() -> bytes:
+        """读取下一批规则并序列化为NDJSON行，读完时返回空字节串"""
+        with rules_lock:
+            return b"".join(
+                orjson.dumps(rule.to_dict()) + b"\n" for rule in islice(rules, RULE_ITER_CHUNK_SIZE)
+            )
+    
+    def close_rules():
+        with rules_lock:
+            rules.close()
+    
+    # 在返回响应前读取首批，查询出错时仍能返回500
+    try:
+        first_lines = await asyncio.to_thread(next_lines)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"流式查询告警规则失败: {str(e)}")
+    
+    async def generate():
+        try:
+            lines = first_lines
+            while lines:
+                yield lines
+                lines = await asyncio.to_thread(next_lines)
+        except Exception as e:
+            # 响应已开始发送无法再改状态码，以最后一行错误信息标明结果不完整
+            yield orjson.dumps({"error": f"流式查询告警规则失败: {str(e)}"}) + b"\n"
+        finally:
+            # 客户端中途断开时关闭生成器以释放数据库连接（屏蔽取消，保证关闭执行完）
+            with anyio.CancelScope(shield=True):
+                await asyncio.to_thread(close_rules)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _body_etag(body: bytes) -> str:
+    """由响应体长度和CRC32生成ETag"""
+    return f'"{len(body):x}-{zlib.crc32(body):08x}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match请求头是否命中当前ETag（弱比较）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 @app.get("/alarmApi/rules/{rule_id}")
-async def get_alert_rule(rule_id: int):
-    """获取指定ID的告警规则"""
+async def get_alert_rule(rule_id: int, request: Request):
+    """获取指定ID的告警规则（支持ETag条件请求）"""
     try:
-        rule = alert_rule_service.get_rule_by_id(rule_id)
+        rule = await _get_rule(rule_id)
         if rule:
-            return {
+            body = orjson.dumps({
                 "success": True,
                 "message": "获取规则成功",
                 "data": {
                     "total": 1,
                     "list": [rule.to_dict()]
                 }
-            }
+            })
+            # updated_at只精确到秒，ETag由响应体内容生成，同一秒内的修改也能识别
+            etag = _body_etag(body)
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
         else:
             return {
                 "success": False,
                 "message": "规则不存在",
-                "data": {
-                    "total": 0,
-                    "list": []
-                }
+                "data": _EMPTY_LIST_DATA
             }
             
     except Exception as e:
@@ -298,66 +625,88 @@ async def get_alert_rule(rule_id: int):
         return {
             "success": False,
             "message": f"获取失败: {str(e)}",
-            "data": {
-                "total": 0,
-                "list": []
-            }
+            "data": _EMPTY_LIST_DATA
         }
 
 
+def _cached_response(body: bytes) -> Response:
+    """返回已序列化的JSON响应体"""
+    return Response(content=body, media_type="application/json")
+
+
+async def _conditional_list_response(request: Request, namespace: str, ttl: int, coro_factory) -> Response:
+    """
+    返回带ETag的列表响应（ETag由响应体长度和CRC32生成）
+    
+    响应体取自短TTL缓存，If-None-Match命中时返回304，省去响应体传输；
+    ETag只取决于内容，缓存版本号递增失败或Redis重启后也不会把已变化的数据误判为未变化
+    """
+    body = await cached(namespace, cache_key(request.url.path, request.url.query), ttl, coro_factory)
+    etag = _body_etag(body)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
 @app.get("/alarmApi/rules")
-async def list_alert_rules(
-    keyword: str = Query("", description="关键词搜索，支持模糊匹配：规则名称、描述、通道ID、点位ID"),
-    service_type: str = Query("", description="服务类型过滤：comsrv, rulesrv, modsrv等"),
-    warning_level: Optional[int] = Query(None, description="告警级别过滤：1=低级, 2=中级, 3=高级"),
-    enabled: Optional[bool] = Query(None, description="启用状态过滤"),
-    start_time: Optional[str] = Query(None, description="开始时间，支持多种格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等"),
-    end_time: Optional[str] = Query(None, description="结束时间，支持多种格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等"),
-    page: int = Query(1, ge=1, description="页码，从1开始"),
-    page_size: int = Query(10, ge=1, le=100, description="每页大小，最大100")
-):
-    """高级搜索告警规则列表"""
+async def list_alert_rules(request: Request, q: RuleListQuery = Depends(_rule_list_query)):
+    """高级搜索告警规则列表（支持ETag条件请求）"""
+    return await _conditional_list_response(
+        request, "rules", RULES_CACHE_TTL, lambda: _list_alert_rules(q)
+    )
+
+
+async def _list_alert_rules(q: RuleListQuery) -> dict:
     try:
         # 使用增强的时间解析器
-        from app.utils.time_parser import parse_time_range
-        
-        start_datetime, end_datetime = parse_time_range(start_time, end_time)
+        start_datetime, end_datetime = parse_time_range(q.start_time, q.end_time)
         
         # 如果时间解析失败，返回错误信息
-        if start_time and not start_datetime:
+        if q.start_time and not start_datetime:
             return {
                 "success": False,
-                "message": f"开始时间格式错误: {start_time}，支持格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等",
-                "data": {"total": 0, "list": []}
+                "message": f"开始时间格式错误: {q.start_time}，支持格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等",
+                "data": _EMPTY_LIST_DATA
             }
         
-        if end_time and not end_datetime:
+        if q.end_time and not end_datetime:
             return {
                 "success": False,
-                "message": f"结束时间格式错误: {end_time}，支持格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等",
-                "data": {"total": 0, "list": []}
+                "message": f"结束时间格式错误: {q.end_time}，支持格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等",
+                "data": _EMPTY_LIST_DATA
             }
         
+        # 传入cursor时走游标分页，不统计总数
+        if q.cursor is not None:
+            return await _search_rules_keyset(
+                keyword=q.keyword,
+                service_type=q.service_type,
+                warning_level=q.warning_level,
+                enabled=q.enabled,
+                start_time=start_datetime,
+                end_time=end_datetime,
+                cursor=q.cursor,
+                page_size=q.page_size
+            )
+        
         # 执行搜索
-        result = alert_rule_service.search_rules(
-            keyword=keyword,
-            service_type=service_type,
-            warning_level=warning_level,
-            enabled=enabled,
+        return await _search_rules(
+            keyword=q.keyword,
+            service_type=q.service_type,
+            warning_level=q.warning_level,
+            enabled=q.enabled,
             start_time=start_datetime,
             end_time=end_datetime,
-            page=page,
-            page_size=page_size
+            page=q.page,
+            page_size=q.page_size
         )
         
-        return result
-        
     except Exception as e:
         logger.error(f"获取告警规则列表失败: {e}")
         return {
             "success": False,
             "message": f"查询失败: {str(e)}",
-            "data": {"total": 0, "list": []}
+            "data": _EMPTY_LIST_DATA
         }
 
 
@@ -369,32 +718,28 @@ async def get_channel_rules(
     """获取指定通道的告警规则"""
     try:
         if service_type:
-            # 如果指定了服务类型，使用更精确的搜索
-            result = alert_rule_service.search_rules(
-                keyword=str(channel_id),
-                service_type=service_type,
-                page=1,
-                page_size=100
-            )
+            # 如果指定了服务类型，按通道ID和服务类型精确查询
+            rules = await _rules_by_channel_and_service(channel_id, service_type)
         else:
-            rules = alert_rule_service.get_rules_by_channel(channel_id)
-            result = {
-                "success": True,
-                "message": f"查询成功，共找到 {len(rules)} 条记录",
-                "data": {
-                    "total": len(rules),
-                    "list": [rule.to_dict() for rule in rules]
-                }
+            rules = await _rules_by_channel(channel_id)
+        
+        result = {
+            "success": True,
+            "message": f"查询成功，共找到 {len(rules)} 条记录",
+            "data": {
+                "total": len(rules),
+                "list": [rule.to_dict() for rule in rules]
             }
+        }
         
-        return result
+        return AppJSONResponse(result)
         
     except Exception as e:
         logger.error(f"获取通道告警规则失败: {e}")
         return {
             "success": False,
             "message": f"查询失败: {str(e)}",
-            "data": {"total": 0, "list": []}
+            "data": _EMPTY_LIST_DATA
         }
 
 
@@ -402,15 +747,19 @@ async def get_channel_rules(
 async def update_alert_rule(rule_id: int, rule_data: dict):
     """更新告警规则"""
     try:
-        # 确保规则ID正确
-        rule_data["id"] = rule_id
+        # 必填、类型和取值校验
+        try:
+            rule_in = AlertRuleIn.model_validate(rule_data)
+        except ValidationError as e:
+            return _rule_validation_error(e, rule_data)
         
-        # 创建AlertRule对象
-        rule = AlertRule.from_dict(rule_data)
+        # 创建AlertRule对象（规则ID以路径参数为准）
+        rule = AlertRule(id=rule_id, **rule_in.model_dump())
         
         # 更新规则
-        success = alert_rule_service.update_rule(rule)
+        success = await asyncio.to_thread(_update_rule, rule)
         if success:
+            await invalidate("rules")
             # 通知监控引擎规则已更新
             asyncio.create_task(alarm_monitor.on_rule_updated(rule_id))
             return {
@@ -422,7 +771,7 @@ async def update_alert_rule(rule_id: int, rule_data: dict):
             return {
                 "success": False,
                 "message": "规则不存在或更新失败",
-                "data": {}
+                "data": _EMPTY_DATA
             }
             
     except Exception as e:
@@ -430,7 +779,7 @@ async def update_alert_rule(rule_id: int, rule_data: dict):
         return {
             "success": False,
             "message": f"更新失败: {str(e)}",
-            "data": {}
+            "data": _EMPTY_DATA
         }
 
 
@@ -441,8 +790,9 @@ async def delete_alert_rule(rule_id: int):
         # 先通知监控引擎处理相关告警
         await alarm_monitor.on_rule_deleted(rule_id)
         
-        success = alert_rule_service.delete_rule(rule_id)
+        success = await asyncio.to_thread(_delete_rule, rule_id)
         if success:
+            await invalidate("rules", "alerts")
             return {
                 "success": True,
                 "message": "告警规则删除成功",
@@ -452,7 +802,7 @@ async def delete_alert_rule(rule_id: int):
             return {
                 "success": False,
                 "message": "规则不存在",
-                "data": {}
+                "data": _EMPTY_DATA
             }
             
     except Exception as e:
@@ -460,129 +810,234 @@ async def delete_alert_rule(rule_id: int):
         return {
             "success": False,
             "message": f"删除失败: {str(e)}",
-            "data": {}
+            "data": _EMPTY_DATA
         }
 
 
-@app.patch("/alarmApi/rules/{rule_id}/enable")
-async def enable_alert_rule(rule_id: int):
-    """启用告警规则"""
-    try:
-        success = alert_rule_service.enable_rule(rule_id)
-        if success:
-            # 通知监控引擎规则已启用
-            asyncio.create_task(alarm_monitor.on_rule_updated(rule_id))
-            return {
-                "success": True,
-                "message": "告警规则启用成功",
-                "data": {"rule_id": rule_id}
-            }
-        else:
+def _make_rule_toggle_endpoint(action: str, service_method):
+    """生成启用/禁用告警规则的端点"""
+    async def toggle_alert_rule(rule_id: int):
+        try:
+            success = await asyncio.to_thread(service_method, rule_id)
+            if success:
+                await invalidate("rules")
+                # 通知监控引擎规则状态已变更（禁用时将解除相关告警）
+                asyncio.create_task(alarm_monitor.on_rule_updated(rule_id))
+                return {
+                    "success": True,
+                    "message": f"告警规则{action}成功",
+                    "data": {"rule_id": rule_id}
+                }
+            else:
+                return {
+                    "success": False,
+                    "message": "规则不存在",
+                    "data": _EMPTY_DATA
+                }
+                
+        except Exception as e:
+            logger.error(f"{action}告警规则失败: {e}")
             return {
                 "success": False,
-                "message": "规则不存在",
-                "data": {}
+                "message": f"{action}失败: {str(e)}",
+                "data": _EMPTY_DATA
             }
-            
-    except Exception as e:
-        logger.error(f"启用告警规则失败: {e}")
-        return {
-            "success": False,
-            "message": f"启用失败: {str(e)}",
-            "data": {}
-        }
+    
+    return toggle_alert_rule
+
 
+for _name, _action, _service_method in (
+    ("enable", "启用", _enable_rule),
+    ("disable", "禁用", _disable_rule),
+):
+    app.add_api_route(
+        f"/alarmApi/rules/{{rule_id}}/{_name}",
+        _make_rule_toggle_endpoint(_action, _service_method),
+        methods=["PATCH"],
+        name=f"{_name}_alert_rule",
+        description=f"{_action}告警规则",
+    )
 
-@app.patch("/alarmApi/rules/{rule_id}/disable")
-async def disable_alert_rule(rule_id: int):
-    """禁用告警规则"""
+
+# 批量操作支持的操作类型及单次请求的最大操作数
+_BULK_ACTIONS = ("update", "delete", "enable", "disable")
+BULK_MAX_OPERATIONS = 500
+
+
+def _bulk_error(message: str) -> dict:
+    return {
+        "success": False,
+        "message": message,
+        "data": _EMPTY_DATA
+    }
+
+
+@app.post("/alarmApi/rules/bulk")
+async def bulk_alert_rules(operations: List[dict]):
+    """
+    批量更新、删除、启用、禁用告警规则（一个数据库事务）
+    
+    每项格式：{"action": "update|delete|enable|disable", "rule_id": 1, "rule": {...}}，rule仅update需要；
+    同一rule_id只能出现一次；任一项校验失败时不执行任何操作，不存在的规则ID跳过并在not_found中返回
+    """
     try:
-        success = alert_rule_service.disable_rule(rule_id)
-        if success:
-            # 通知监控引擎规则已禁用（将解除相关告警）
-            asyncio.create_task(alarm_monitor.on_rule_updated(rule_id))
-            return {
-                "success": True,
-                "message": "告警规则禁用成功",
-                "data": {"rule_id": rule_id}
-            }
-        else:
-            return {
-                "success": False,
-                "message": "规则不存在",
-                "data": {}
-            }
+        if not operations:
+            return _bulk_error("操作列表为空")
+        if len(operations) > BULK_MAX_OPERATIONS:
+            return _bulk_error(f"单次最多支持 {BULK_MAX_OPERATIONS} 项操作")
+        
+        updates, delete_ids, enable_ids, disable_ids = [], [], [], []
+        action_ids = {"delete": delete_ids, "enable": enable_ids, "disable": disable_ids}
+        seen_ids = set()
+        
+        for index, operation in enumerate(operations, start=1):
+            action = operation.get("action")
+            rule_id = operation.get("rule_id")
+            if action not in _BULK_ACTIONS:
+                return _bulk_error(f"第{index}项操作类型无效: {action}，支持：{'、'.join(_BULK_ACTIONS)}")
+            if type(rule_id) is not int or rule_id <= 0:
+                return _bulk_error(f"第{index}项缺少有效的rule_id")
+            # 同一规则只允许一项操作，执行顺序与列表顺序无关
+            if rule_id in seen_ids:
+                return _bulk_error(f"第{index}项规则ID重复: {rule_id}")
+            seen_ids.add(rule_id)
             
-    except Exception as e:
-        logger.error(f"禁用告警规则失败: {e}")
+            if action == "update":
+                rule_data = operation.get("rule", {})
+                if not isinstance(rule_data, dict):
+                    return _bulk_error(f"第{index}项的rule必须是对象")
+                try:
+                    rule_in = AlertRuleIn.model_validate(rule_data)
+                except ValidationError as e:
+                    result = _rule_validation_error(e, rule_data)
+                    result["message"] = f"第{index}项: {result['message']}"
+                    return result
+                updates.append(AlertRule(id=rule_id, **rule_in.model_dump()))
+            else:
+                action_ids[action].append(rule_id)
+        
+        # 规则变更和相关告警的解除在同一事务中完成
+        applied = await asyncio.to_thread(_bulk_apply_rules, updates, delete_ids, enable_ids, disable_ids)
+        if applied is None:
+            return _bulk_error("批量操作失败")
+        result, resolved_alerts = applied
+        
+        # 删除规则会级联删除其告警，解除告警也会改变告警列表，同时清除告警缓存
+        await invalidate(*(("rules", "alerts") if result["deleted"] or resolved_alerts else ("rules",)))
+        
+        # 通知监控引擎为解除的告警发送恢复广播
+        if resolved_alerts:
+            asyncio.create_task(alarm_monitor.on_alerts_resolved(resolved_alerts, set(result["deleted"])))
+        
+        done_count = len(result["updated"]) + len(result["enabled"]) + len(result["disabled"]) + len(result["deleted"])
         return {
-            "success": False,
-            "message": f"禁用失败: {str(e)}",
-            "data": {}
+            "success": True,
+            "message": f"批量操作完成，成功 {done_count} 项，未找到 {len(result['not_found'])} 个规则",
+            "data": result
         }
+        
+    except Exception as e:
+        logger.error(f"批量操作告警规则失败: {e}")
+        return _bulk_error(f"批量操作失败: {str(e)}")
 
 
 # ==================== 告警管理API ====================
 
 @app.get("/alarmApi/alerts")
 async def list_alerts(
-    keyword: str = Query("", description="关键词搜索，支持规则名称、通道ID、点位ID"),
-    service_type: str = Query("", description="服务类型过滤"),
-    warning_level: Optional[int] = Query(None, description="告警级别过滤"),
-    start_time: Optional[str] = Query(None, description="开始时间，支持多种格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等"),
-    end_time: Optional[str] = Query(None, description="结束时间，支持多种格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等"),
-    page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(10, ge=1, le=100, description="每页大小")
+    request: Request,
+    keyword: str = _KEYWORD_Q,
+    service_type: str = _SERVICE_TYPE_Q,
+    warning_level: Optional[int] = _WARNING_LEVEL_Q,
+    start_time: Optional[str] = _START_Q,
+    end_time: Optional[str] = _END_Q,
+    page: int = _PAGE_Q,
+    page_size: int = _PAGE_SIZE_Q
 ):
-    """获取当前告警列表"""
+    """获取当前告警列表（支持ETag条件请求）"""
+    return await _conditional_list_response(
+        request, "alerts", ALERTS_CACHE_TTL,
+        lambda: _list_alerts(keyword, service_type, warning_level, start_time, end_time, page, page_size)
+    )
+
+
+async def _list_alerts(keyword: str, service_type: str, warning_level: Optional[int],
+                       start_time: Optional[str], end_time: Optional[str],
+                       page: int, page_size: int) -> dict:
     try:
         # 使用增强的时间解析器
-        from app.utils.time_parser import parse_time_range
-        
-        start_datetime, end_datetime = parse_time_range(start_time, end_time)
+        start_ts, end_ts = parse_time_range_epoch(start_time, end_time)
         
         # 如果时间解析失败，返回错误信息
-        if start_time and not start_datetime:
+        if start_time and start_ts is None:
             return {
                 "success": False,
                 "message": f"开始时间格式错误: {start_time}，支持格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等",
-                "data": {"total": 0, "list": []}
+                "data": _EMPTY_LIST_DATA
             }
         
-        if end_time and not end_datetime:
+        if end_time and end_ts is None:
             return {
                 "success": False,
                 "message": f"结束时间格式错误: {end_time}，支持格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等",
-                "data": {"total": 0, "list": []}
+                "data": _EMPTY_LIST_DATA
             }
         
         # 执行搜索
-        result = alert_service.search_alerts(
+        return await asyncio.to_thread(
+            alert_service.search_alerts,
             keyword=keyword,
             warning_level=warning_level,
             service_type=service_type,
-            start_time=start_datetime,
-            end_time=end_datetime,
+            start_time=start_ts,
+            end_time=end_ts,
             page=page,
             page_size=page_size
         )
         
-        return result
-        
     except Exception as e:
         logger.error(f"获取告警列表失败: {e}")
         return {
             "success": False,
             "message": f"查询失败: {str(e)}",
-            "data": {"total": 0, "list": []}
+            "data": _EMPTY_LIST_DATA
+        }
+
+
+# 告警推流无事件时发送保活注释的间隔（秒），防止代理断开空闲连接
+_SSE_KEEPALIVE_INTERVAL = 15
+
+
+@app.get("/alarmApi/alerts/stream")
+async def stream_alerts():
+    """告警推流（Server-Sent Events）：推送告警触发、恢复和告警数量消息"""
+    async def generate():
+        queue = alarm_monitor.subscribe()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), _SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            # 客户端断开时注销订阅
+            alarm_monitor.unsubscribe(queue)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
         }
+    )
 
 
 @app.get("/alarmApi/alerts/{alert_id}")
 async def get_alert(alert_id: int):
     """获取指定告警详情"""
     try:
-        alert = alert_service.get_alert_by_id(alert_id)
+        alert = await asyncio.to_thread(alert_service.get_alert_by_id, alert_id)
         if alert:
             return {
                 "success": True,
@@ -596,7 +1051,7 @@ async def get_alert(alert_id: int):
             return {
                 "success": False,
                 "message": "告警不存在",
-                "data": {"total": 0, "list": []}
+                "data": _EMPTY_LIST_DATA
             }
             
     except Exception as e:
@@ -604,7 +1059,7 @@ async def get_alert(alert_id: int):
         return {
             "success": False,
             "message": f"获取失败: {str(e)}",
-            "data": {"total": 0, "list": []}
+            "data": _EMPTY_LIST_DATA
         }
 
 
@@ -614,8 +1069,9 @@ async def resolve_alert(alert_id: int, resolve_data: dict = None):
     try:
         recovery_value = resolve_data.get("recovery_value") if resolve_data else None
         
-        success = alert_service.resolve_alert(alert_id, recovery_value)
+        success = await asyncio.to_thread(alert_service.resolve_alert, alert_id, recovery_value)
         if success:
+            await invalidate("alerts")
             return {
                 "success": True,
                 "message": "告警已解除",
@@ -625,7 +1081,7 @@ async def resolve_alert(alert_id: int, resolve_data: dict = None):
             return {
                 "success": False,
                 "message": "告警不存在或解除失败",
-                "data": {}
+                "data": _EMPTY_DATA
             }
             
     except Exception as e:
@@ -633,114 +1089,132 @@ async def resolve_alert(alert_id: int, resolve_data: dict = None):
         return {
             "success": False,
             "message": f"解除失败: {str(e)}",
-            "data": {}
+            "data": _EMPTY_DATA
         }
 
 
 @app.get("/alarmApi/alert-events")
 async def list_alert_events(
-    keyword: str = Query("", description="关键词搜索，支持模糊匹配：规则名称、通道ID、点位ID"),
-    service_type: str = Query("", description="服务类型过滤"),
-    warning_level: Optional[int] = Query(None, description="告警级别过滤"),
-    event_type: str = Query("", description="事件类型：trigger/recovery"),
-    start_time: Optional[str] = Query(None, description="开始时间，支持多种格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等"),
-    end_time: Optional[str] = Query(None, description="结束时间，支持多种格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等"),
-    page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(10, ge=1, le=100, description="每页大小")
+    keyword: str = _KEYWORD_Q,
+    service_type: str = _SERVICE_TYPE_Q,
+    warning_level: Optional[int] = _WARNING_LEVEL_Q,
+    event_type: str = _EVENT_TYPE_Q,
+    start_time: Optional[str] = _START_Q,
+    end_time: Optional[str] = _END_Q,
+    page: int = _PAGE_Q,
+    page_size: int = _PAGE_SIZE_Q
 ):
     """获取告警事件历史"""
     try:
         # 使用增强的时间解析器
-        from app.utils.time_parser import parse_time_range
-        
-        start_datetime, end_datetime = parse_time_range(start_time, end_time)
+        start_ts, end_ts = parse_time_range_epoch(start_time, end_time)
         
         # 如果时间解析失败，返回错误信息
-        if start_time and not start_datetime:
+        if start_time and start_ts is None:
             return {
                 "success": False,
                 "message": f"开始时间格式错误: {start_time}，支持格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等",
-                "data": {"total": 0, "list": []}
+                "data": _EMPTY_LIST_DATA
             }
         
-        if end_time and not end_datetime:
+        if end_time and end_ts is None:
             return {
                 "success": False,
                 "message": f"结束时间格式错误: {end_time}，支持格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等",
-                "data": {"total": 0, "list": []}
+                "data": _EMPTY_LIST_DATA
             }
         
         # 执行查询
-        result = alert_service.get_alert_events(
+        result = await asyncio.to_thread(
+            alert_service.get_alert_events,
             keyword=keyword,
             warning_level=warning_level,
             service_type=service_type,
             event_type=event_type,
-            start_time=start_datetime,
-            end_time=end_datetime,
+            start_time=start_ts,
+            end_time=end_ts,
             page=page,
             page_size=page_size
         )
         
-        return result
+        return AppJSONResponse(result)
         
     except Exception as e:
         logger.error(f"获取告警事件失败: {e}")
         return {
             "success": False,
             "message": f"查询失败: {str(e)}",
-            "data": {"total": 0, "list": []}
+            "data": _EMPTY_LIST_DATA
         }
 
 
 @app.get("/alarmApi/alert-events/export")
 async def export_alert_events(
-    keyword: str = Query("", description="关键词搜索，支持模糊匹配：规则名称、通道ID、点位ID"),
-    service_type: str = Query("", description="服务类型过滤：comsrv, rulesrv, modsrv等"),
-    warning_level: Optional[int] = Query(None, description="告警级别过滤：1=一般, 2=重要, 3=紧急"),
-    event_type: str = Query("", description="事件类型过滤：trigger=触发, recovery=恢复"),
-    start_time: Optional[str] = Query(None, description="开始时间，支持多种格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等"),
-    end_time: Optional[str] = Query(None, description="结束时间，支持多种格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等")
+    keyword: str = _KEYWORD_Q,
+    service_type: str = _SERVICE_TYPE_Q,
+    warning_level: Optional[int] = _WARNING_LEVEL_Q,
+    event_type: str = _EVENT_TYPE_Q,
+    start_time: Optional[str] = _START_Q,
+    end_time: Optional[str] = _END_Q
 ):
     """导出告警事件历史为CSV文件"""
     try:
         # 使用增强的时间解析器
-        from app.utils.time_parser import parse_time_range
-        
-        start_datetime, end_datetime = parse_time_range(start_time, end_time)
+        start_ts, end_ts = parse_time_range_epoch(start_time, end_time)
         
         # 如果时间解析失败，返回错误信息
-        if start_time and not start_datetime:
+        if start_time and start_ts is None:
             raise HTTPException(status_code=400, detail=f"开始时间格式错误: {start_time}，支持格式：2025-08-21、2025-08-21 00:00:00、2025-08-21T00:00:00等")
         
-        if end_time and not end_datetime:
+        if end_time and end_ts is None:
             raise HTTPException(status_code=400, detail=f"结束时间格式错误: {end_time}，支持格式：2025-08-21、2025-08-21 23:59:59、2025-08-21T23:59:59等")
         
-        # 调用服务层导出方法
-        csv_content = alert_service.export_alert_events_csv(
+        # 调用服务层分块导出方法
+        chunks = alert_service.iter_alert_events_csv(
             keyword=keyword,
             service_type=service_type,
             warning_level=warning_level,
             event_type=event_type,
-            start_time=start_datetime,
-            end_time=end_datetime
+            start_time=start_ts,
+            end_time=end_ts
         )
+        # 生成器在线程池中推进，加锁避免关闭时与仍在执行的next并发
+        chunks_lock = threading.Lock()
+        
+        def next_chunk():
+            with chunks_lock:
+                return next(chunks, None)
+        
+        def close_chunks():
+            with chunks_lock:
+                chunks.close()
+        
+        # 在返回响应前读取首块，查询出错时仍能返回500
+        first_chunk = await asyncio.to_thread(next_chunk)
+        
+        async def generate():
+            try:
+                yield _CSV_BOM  # 使用UTF-8 BOM以支持中文Excel
+                chunk = first_chunk
+                while chunk is not None:
+                    yield chunk
+                    chunk = await asyncio.to_thread(next_chunk)
+            finally:
+                # 客户端中途断开时关闭生成器以释放数据库连接（屏蔽取消，保证关闭执行完）
+                with anyio.CancelScope(shield=True):
+                    await asyncio.to_thread(close_chunks)
         
         # 生成文件名（使用英文避免编码问题）
         current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"alarm_events_export_{current_time}.csv"
         
-        # 将CSV内容转换为字节流
-        csv_bytes = csv_content.encode('utf-8-sig')  # 使用UTF-8 BOM以支持中文Excel
-        
-        # 返回文件下载响应
+        # 返回文件下载响应（分块传输，不设置Content-Length）
         return StreamingResponse(
-            io.BytesIO(csv_bytes),
+            generate(),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
-                "Cache-Control": "no-cache",
-                "Content-Length": str(len(csv_bytes))
+                "Cache-Control": "no-cache"
             }
         )
         
@@ -752,14 +1226,19 @@ async def export_alert_events(
 @app.get("/alarmApi/alert-statistics")
 async def get_alert_statistics():
     """获取告警统计信息"""
+    body = await cached("alerts", "statistics", ALERTS_CACHE_TTL, _get_alert_statistics)
+    return _cached_response(body)
+
+
+async def _get_alert_statistics() -> dict:
     try:
-        return alert_service.get_alert_statistics()
+        return await asyncio.to_thread(alert_service.get_alert_statistics)
     except Exception as e:
         logger.error(f"获取告警统计失败: {e}")
         return {
             "success": False,
             "message": f"获取失败: {str(e)}",
-            "data": {}
+            "data": _EMPTY_DATA
         }
 
 
@@ -768,8 +1247,13 @@ async def get_alert_statistics():
 @app.get("/alarmApi/monitor/status")
 async def get_monitor_status():
     """获取监控状态"""
+    body = await cached("monitor", "status", MONITOR_CACHE_TTL, _get_monitor_status)
+    return _cached_response(body)
+
+
+async def _get_monitor_status() -> dict:
     try:
-        status = alarm_monitor.get_monitor_status()
+        status = await alarm_monitor.get_monitor_status()
         return {
             "success": True,
             "message": "获取监控状态成功",
@@ -780,7 +1264,7 @@ async def get_monitor_status():
         return {
             "success": False,
             "message": f"获取失败: {str(e)}",
-            "data": {}
+            "data": _EMPTY_DATA
         }
 
 
@@ -795,21 +1279,21 @@ async def manual_check_rule(rule_id: int):
         return {
             "success": False,
             "message": f"检查失败: {str(e)}",
-            "data": {}
+            "data": _EMPTY_DATA
         }
 
 
 if __name__ == "__main__":
-    # 确保日志目录存在
-    log_dir = Path(settings.LOG_FILE).parent
-    if not log_dir.exists():
-        log_dir.mkdir(parents=True, exist_ok=True)
+    # 启动服务：调试模式单进程热重载，否则按配置启动多个工作进程共享监听端口
+    if settings.DEBUG:
+        process_options = {"reload": True}
+    else:
+        process_options = {"workers": settings.UVICORN_WORKERS}
     
-    # 启动服务
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG,
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        **process_options
     )